@@ -0,0 +1,8 @@
+"""
+Performance benchmarks for Mattang. Run from the repository root, e.g.
+
+    python -m benchmarks.pie_markers
+
+benchmarks.suite times all the hot paths across dataset sizes and can check a run against
+a saved baseline.
+"""
@@ -0,0 +1,56 @@
+"""
+Time maps of growing numbers of languages with and without aggregating nearby markers. With
+aggregation the time and the number of wedges drawn should level off once the map is full,
+for discrete and continuous features alike.
+
+    python -m benchmarks.aggregation [--rows 1000 10000 100000] [--shapefile FILE]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+
+from mattang import FeatureMap
+
+from .synthetic import make_languages
+
+
+# Discrete, and continuous with a colour per two languages
+FEATURES = [["word_order", "tone"], ["word_order", "consonants"]]
+COLOURS = ["viridis", "plasma"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--shapefile", help="basemap to use instead of the Natural Earth coastlines")
+    args = parser.parse_args()
+
+    print("{:>8} {:>24} {:>10} {:>10} {:>8}".format("rows", "features", "separate", "aggregated", "wedges"))
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "map.png")
+        for n in args.rows:
+            fm = FeatureMap()
+            fm.shapefile = args.shapefile
+            fm.load_data(make_languages(n))
+            for features in FEATURES:
+                times = []
+                for aggregate in (False, True):
+                    start = time.perf_counter()
+                    fm.draw(filename, features, COLOURS, dpi=args.dpi, aggregate=aggregate, seed=0)
+                    times.append(time.perf_counter() - start)
+                # Count the slices of the single markers and the wedges of the aggregated ones
+                fm.reuse_figure = True
+                fm.draw(filename, features, COLOURS, dpi=args.dpi, aggregate=True, seed=0)
+                wedges = sum(
+                    max(len(collection.get_offsets()), len(collection.get_paths())) for collection in fm.artists
+                )
+                fm.reuse_figure = False
+                fm.close()
+                print("{:>8} {:>24} {:>9.3f}s {:>9.3f}s {:>8}".format(
+                    n, ",".join(features), times[0], times[1], wedges,
+                ), flush=True)
@@ -0,0 +1,47 @@
+"""
+Time regional maps of a large dataset with and without culling the languages and isoglosses
+outside the map extent.
+
+    python -m benchmarks.culling [--rows 20000] [--extent 140 146 -6 0] [--shapefile FILE]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+
+from mattang import FeatureMap
+
+from .synthetic import make_languages
+
+
+def time_draw(dataframe, extent, shapefile, dpi, cull):
+    fm = FeatureMap()
+    fm.shapefile = shapefile
+    fm.extent = extent
+    fm.load_data(dataframe)
+    if not cull:
+        fm._view_bounds = lambda margin=None: None
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        fm.draw(os.path.join(tmp, "map.png"), ["word_order", "vowels"], ["viridis", "plasma"], ["tone"], dpi=dpi)
+        return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--extent", type=float, nargs=4, default=[140, 146, -6, 0], help="x0 x1 y0 y1")
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--shapefile", help="basemap to use instead of the Natural Earth coastlines")
+    args = parser.parse_args()
+
+    dataframe = make_languages(args.rows)
+    x0, x1, y0, y1 = args.extent
+    visible = dataframe["longitude"].between(x0, x1) & dataframe["latitude"].between(y0, y1)
+    print("{} of {} languages inside the extent".format(visible.sum(), len(dataframe)))
+    for cull in (False, True):
+        seconds = time_draw(dataframe, args.extent, args.shapefile, args.dpi, cull)
+        print("{:<10} {:.3f}s".format("culled" if cull else "all", seconds))
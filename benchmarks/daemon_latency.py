@@ -0,0 +1,84 @@
+"""
+Per-map latency of a cold render, which starts a fresh interpreter like every container run
+does, against a request to an already warm render server.
+
+    python -m benchmarks.daemon_latency [--rows 1000] [--maps 5] [--shapefile FILE]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from urllib.request import Request, urlopen
+
+from .synthetic import make_languages
+
+
+COLD_SCRIPT = """
+import sys
+import matplotlib
+matplotlib.use("Agg")
+from pandas import read_csv
+from mattang import FeatureMap
+infile, outfile, shapefile = sys.argv[1:]
+fm = FeatureMap()
+fm.shapefile = shapefile or None
+fm.load_data(read_csv(infile, sep="\\t"))
+fm.draw(outfile, ["word_order", "vowels"], ["viridis", "plasma"], ["tone"])
+"""
+
+FEATURES = {"features": ["word_order", "vowels"], "colours": ["viridis", "plasma"], "isoglosses": ["tone"]}
+
+
+def cold(infile, outfile, shapefile):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", COLD_SCRIPT, infile, outfile, shapefile or ""], check=True)
+    return time.perf_counter() - start
+
+
+def warm(url, infile, outfile, shapefile):
+    request = dict(FEATURES, infile=infile, outfile=outfile, shapefile=shapefile)
+    start = time.perf_counter()
+    response = urlopen(Request(url + "/render", data=json.dumps(request).encode()))
+    result = json.loads(response.read())
+    if result["error"]:
+        raise RuntimeError(result["error"])
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--maps", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8758)
+    parser.add_argument("--shapefile", help="basemap to use instead of the Natural Earth coastlines")
+    args = parser.parse_args()
+    shapefile = os.path.abspath(args.shapefile) if args.shapefile else None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        infile = os.path.join(tmp, "languages.tsv")
+        make_languages(args.rows).to_csv(infile, sep="\t", index=False)
+        outfile = os.path.join(tmp, "map.png")
+
+        cold_times = [cold(infile, outfile, shapefile) for i in range(args.maps)]
+
+        server = subprocess.Popen(
+            [sys.executable, "-m", "mattang.server", "--port", str(args.port), "--preload", infile],
+            stdout=subprocess.PIPE, text=True,
+        )
+        try:
+            # Wait until it's listening
+            while "listening" not in server.stdout.readline():
+                pass
+            url = "http://127.0.0.1:{}".format(args.port)
+            warm_times = [warm(url, infile, outfile, shapefile) for i in range(args.maps)]
+        finally:
+            server.terminate()
+            server.wait()
+
+    print("{:>6} {:>10} {:>10} {:>10}".format("mode", "min (s)", "mean (s)", "max (s)"))
+    for name, times in [("cold", cold_times), ("warm", warm_times)]:
+        print("{:>6} {:>10.3f} {:>10.3f} {:>10.3f}".format(name, min(times), sum(times) / len(times), max(times)))
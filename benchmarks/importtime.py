@@ -0,0 +1,70 @@
+"""
+Guard the startup time of tools that only import mattang to load and check data. Each
+scenario runs in a fresh interpreter under `python -X importtime`. The script fails if the
+scenario imports any of the plotting stack, or if importing mattang takes longer than
+--max-ms.
+
+    python -m benchmarks.importtime [--repeat 5] [--max-ms 500]
+"""
+import argparse
+import subprocess
+import sys
+
+
+LOAD_DATA = """
+import pandas
+import mattang
+fm = mattang.FeatureMap()
+fm.load_data(pandas.DataFrame({
+    "latitude": [1.5, -3.0, 2.0], "longitude": [130.0, 140.5, 150.0], "tone": ["yes", "no", "yes"],
+}))
+fm._check_input(["tone"], ["viridis"])
+"""
+
+# Code to run, and the packages it mustn't import
+SCENARIOS = {
+    "import": ("import mattang", ["matplotlib", "mpl_toolkits", "cartopy", "scipy", "shapely", "pandas"]),
+    "load_data": (LOAD_DATA, ["matplotlib", "mpl_toolkits", "cartopy", "scipy", "shapely"]),
+}
+
+
+def importtime(code):
+    """Run `code` in a new interpreter, returning the cumulative import time in microseconds
+    of each top level module imported, and the names of all modules imported.
+    """
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        stderr=subprocess.PIPE, universal_newlines=True, check=True,
+    ).stderr
+    cumulative, modules = {}, []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line.split("|")
+        if not total.strip().isdigit():
+            continue # The header
+        modules.append(name.strip())
+        if not name[1:].startswith(" "):
+            cumulative[name.strip()] = int(total)
+    return cumulative, modules
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each scenario, the fastest counts")
+    parser.add_argument("--max-ms", type=float, default=500, help="longest allowed mattang import")
+    args = parser.parse_args()
+
+    failures = []
+    for name, (code, forbidden) in SCENARIOS.items():
+        runs = [importtime(code) for _ in range(args.repeat)]
+        ms = min(cumulative.get("mattang", 0) for cumulative, _ in runs) / 1000
+        heavy = sorted({m.split(".")[0] for m in runs[0][1]} & set(forbidden))
+        print("{:<10} import mattang {:>7.1f} ms  plotting stack: {}".format(name, ms, ", ".join(heavy) or "not imported"))
+        if heavy:
+            failures.append("{} imported {}".format(name, ", ".join(heavy)))
+        if ms > args.max_ms:
+            failures.append("{} took {:.0f} ms to import mattang".format(name, ms))
+
+    if failures:
+        sys.exit("\n".join(failures))
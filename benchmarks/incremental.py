@@ -0,0 +1,46 @@
+"""
+Time redrawing the same map with different features, keeping the figure between draws
+(reuse_figure) against also keeping the basemap as a raster (incremental). With incremental
+rendering the redraw time should depend on the markers, not the basemap.
+
+    python -m benchmarks.incremental [--rows 1000] [--redraws 10] [--shapefile FILE]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+
+from mattang import FeatureMap
+
+from .synthetic import make_languages
+
+
+FEATURES = [["word_order"], ["tone", "vowels"], ["consonants"], ["word_order", "tone"]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--redraws", type=int, default=10)
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--shapefile", help="basemap to use instead of the Natural Earth coastlines")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "map.png")
+        for mode in ("reuse_figure", "incremental"):
+            fm = FeatureMap()
+            fm.shapefile = args.shapefile
+            fm.extent = [128, 165, -12, 2]
+            setattr(fm, mode, True)
+            fm.load_data(make_languages(args.rows))
+            first = fm.draw(filename, FEATURES[0], dpi=args.dpi, seed=0).seconds
+            start = time.perf_counter()
+            for i in range(args.redraws):
+                fm.draw(filename, FEATURES[(i + 1) % len(FEATURES)], dpi=args.dpi, seed=0)
+            redraw = (time.perf_counter() - start) / args.redraws
+            print("{:<13} first {:.3f}s, then {:.3f}s per redraw".format(mode, first, redraw), flush=True)
+            fm.close()
@@ -0,0 +1,49 @@
+"""
+Outlines per second of build_isogloss, against the random-sample re-hulling it replaced.
+
+    python -m benchmarks.isoglosses [--sizes 10 100 1000] [--seconds 2]
+"""
+import argparse
+import time
+
+import numpy
+from scipy.spatial import ConvexHull
+
+from mattang.geometry import build_isogloss, buffer_convex_hull, is_colinear, points_circumference
+
+
+def legacy_build_isogloss(points, padding=.1, roundedness=100, scale=.001):
+    """The isogloss construction build_isogloss replaced"""
+    points = list(points)
+    pdiff = 3 - len(points)
+    if pdiff > 0:
+        points.extend(points_circumference(points[0], scale, pdiff))
+    if is_colinear(points):
+        points.extend(points_circumference(points[0], scale, 1))
+    hull = ConvexHull(points)
+    buff_hull = buffer_convex_hull(hull, padding, roundedness)
+    return [(buff_hull.points[simplex, 0], buff_hull.points[simplex, 1]) for simplex in buff_hull.simplices]
+
+
+def outlines_per_second(func, points, seconds):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        func(points)
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="points per group")
+    parser.add_argument("--seconds", type=float, default=2, help="time to spend on each measurement")
+    args = parser.parse_args()
+
+    rng = numpy.random.default_rng(0)
+    print("{:>8} {:>8} {:>14}".format("points", "impl", "outlines/s"))
+    for n in args.sizes:
+        points = [tuple(p) for p in rng.normal(0, 1, (n, 2))]
+        for name, func in [("legacy", legacy_build_isogloss), ("analytic", build_isogloss)]:
+            rate = outlines_per_second(func, points, args.seconds)
+            print("{:>8} {:>8} {:>14.1f}".format(n, name, rate))
@@ -0,0 +1,52 @@
+"""
+Compare reading a wide spreadsheet whole with read_csv against read_sheet, which only reads
+the columns being mapped, in time and peak traced memory.
+
+    python -m benchmarks.loading [--rows 20000] [--features 200] [--plotted 3]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from pandas import read_csv
+
+from mattang.sheets import read_sheet
+
+from .synthetic import make_wide_sheet
+
+
+def measure(load):
+    tracemalloc.start()
+    start = time.perf_counter()
+    dataframe = load()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, dataframe.memory_usage(deep=True).sum()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--features", type=int, default=200)
+    parser.add_argument("--plotted", type=int, default=3, help="number of feature columns to read")
+    args = parser.parse_args()
+
+    sheet = make_wide_sheet(args.rows, args.features)
+    columns = [c for c in sheet.columns if c.startswith("feature")][:args.plotted]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sheet")
+        sheet.to_csv(path, sep="\t", index=False)
+        del sheet
+        loaders = [
+            ("read_csv, all columns", lambda: read_csv(path, sep="\t")),
+            ("read_sheet, {} columns".format(len(columns)), lambda: read_sheet(path, columns)),
+        ]
+        for name, load in loaders:
+            elapsed, peak, size = measure(load)
+            print("{:<24} {:>7.3f}s  peak {:>7.1f} MiB  dataframe {:>7.1f} MiB".format(
+                name, elapsed, peak / 2**20, size / 2**20,
+            ))
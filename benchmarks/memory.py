@@ -0,0 +1,64 @@
+"""
+Check that resident memory stays flat over many consecutive draws from one FeatureMap.
+Exits with an error if RSS grows by more than --tolerance after the warm-up draws.
+
+    python -m benchmarks.memory [--draws 1000] [--reuse-figure] [--shapefile FILE]
+
+tests/test_featuremap.py runs a shorter version of this check with pytest.
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+
+import matplotlib
+matplotlib.use("Agg")
+
+import mattang.featuremap
+
+from mattang import FeatureMap
+
+from .synthetic import make_languages
+
+
+def rss():
+    """Current resident set size in bytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak rather than current, but it can only grow if memory does
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--draws", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--dpi", type=int, default=50)
+    parser.add_argument("--tolerance", type=float, default=0.05, help="allowed relative RSS growth")
+    parser.add_argument("--reuse-figure", action="store_true")
+    parser.add_argument("--shapefile", help="basemap to use instead of the Natural Earth coastlines")
+    args = parser.parse_args()
+
+    mattang.featuremap.DPI = args.dpi
+    fm = FeatureMap()
+    fm.shapefile = args.shapefile
+    fm.reuse_figure = args.reuse_figure
+    fm.load_data(make_languages(args.rows))
+
+    with tempfile.TemporaryDirectory() as tmp, fm:
+        filename = os.path.join(tmp, "map.png")
+        for i in range(args.draws):
+            fm.draw(filename, ["word_order", "vowels"], ["viridis", "plasma"], ["tone"])
+            if i + 1 == args.warmup:
+                baseline = rss()
+            if (i + 1) % 100 == 0:
+                print("{:>6} draws: {:.1f} MiB".format(i + 1, rss() / 2**20), flush=True)
+
+    growth = (rss() - baseline) / baseline
+    print("RSS growth after warm-up: {:.1%}".format(growth))
+    if growth > args.tolerance:
+        sys.exit("RSS grew by more than {:.0%}".format(args.tolerance))
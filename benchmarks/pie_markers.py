@@ -0,0 +1,100 @@
+"""
+Compare the old one-scatter-per-slice-per-language marker drawing against the batched
+marker engine in FeatureMap._draw_pie_markers.
+
+    python -m benchmarks.pie_markers [--sizes 1000 10000 50000]
+"""
+import argparse
+import time
+
+import numpy
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib import colors
+
+from mattang import FeatureMap
+
+from .synthetic import make_languages
+
+
+FEATURES = ["word_order", "vowels", "tone"]
+COLOURS = ["viridis", "plasma", "tab10"]
+
+
+def legacy_plotdata(dataframe):
+    """The eager groupby-based plotting metadata that FeatureMap.load_data used to build"""
+    plotdata = {}
+    for feature in dataframe.columns:
+        data = dataframe[feature]
+        ndata = len(data)
+        if dataframe.dtypes[feature] in ["float64", "int64"]:
+            plotdata[feature] = {
+                "type": "continuous",
+                "norm": colors.Normalize(min(data), max(data)),
+                "groups": dataframe.groupby(feature),
+                "range": int(ndata / 2),
+            }
+        else:
+            groups = dataframe.groupby(feature)
+            plotdata[feature] = {
+                "type": "discrete",
+                "norm": colors.BoundaryNorm([i for i in range(ndata)], ndata),
+                "groups": groups,
+                "range": len(groups),
+            }
+    return plotdata
+
+
+def legacy_pie_markers(fm, features, colours, size=250):
+    """The per-language drawing path that _draw_pie_markers replaced"""
+    plotdata = legacy_plotdata(fm.dataframe)
+    for _, language in fm.dataframe.iterrows():
+        colourmaps = [plt.get_cmap(c, plotdata[f]["range"]) for f, c in zip(features, colours)]
+        cumsum = numpy.cumsum([2 for f in features])
+        cumsum = cumsum / cumsum[-1]
+        pie = [0] + cumsum.tolist()
+        for r1, r2, feat, cmap in zip(pie[:-1], pie[1:], features, colourmaps):
+            value = language[feat]
+            if plotdata[feat]["type"] == "discrete":
+                value = plotdata[feat]["groups"].get_group(value).index[0]
+            colour = cmap(plotdata[feat]["norm"](value))
+            angles = numpy.linspace(2 * numpy.pi * r1, 2 * numpy.pi * r2)
+            xy = numpy.column_stack([[0] + numpy.cos(angles).tolist(), [0] + numpy.sin(angles).tolist()])
+            fm.axis.scatter(
+                [language["longitude"]],
+                [language["latitude"]],
+                marker=xy, facecolor=colour, s=size, alpha=1,
+                transform=fm.data_crs,
+            )
+
+
+def batched_pie_markers(fm, features, colours):
+    fm._draw_pie_markers(features, colours)
+
+
+def run(fm, draw_markers):
+    """Time drawing the markers and rendering the figure, returning (draw, render, artists)"""
+    fm.fig, fm.axis = plt.subplots(1, 1, subplot_kw=dict(projection=fm.data_crs))
+    start = time.perf_counter()
+    draw_markers(fm, FEATURES, COLOURS)
+    drawn = time.perf_counter()
+    fm.fig.canvas.draw()
+    rendered = time.perf_counter()
+    artists = len(fm.axis.collections)
+    plt.close(fm.fig)
+    return drawn - start, rendered - drawn, artists
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    print("{:>8} {:>8} {:>10} {:>10} {:>8}".format("rows", "path", "draw (s)", "render (s)", "artists"))
+    for n in args.sizes:
+        fm = FeatureMap()
+        fm.load_data(make_languages(n))
+        for name, func in [("legacy", legacy_pie_markers), ("batched", batched_pie_markers)]:
+            draw, render, artists = run(fm, func)
+            print("{:>8} {:>8} {:>10.3f} {:>10.3f} {:>8}".format(n, name, draw, render, artists))
@@ -0,0 +1,55 @@
+"""
+Load time and memory of the lazy per-feature plot data store, against the eager groupby
+metadata load_data used to build for every column, on a wide synthetic sheet.
+
+    python -m benchmarks.plot_data [--rows 5000] [--features 400] [--plotted 4]
+"""
+import argparse
+import time
+import tracemalloc
+
+from mattang import FeatureMap
+
+from .pie_markers import legacy_plotdata
+from .synthetic import make_wide_sheet
+
+
+def measure(func):
+    """Return (seconds, peak bytes, retained bytes) of calling `func`"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return seconds, peak, retained
+
+
+def eager(dataframe):
+    return legacy_plotdata(dataframe)
+
+
+def lazy(dataframe, plotted):
+    fm = FeatureMap()
+    fm.load_data(dataframe)
+    for feature in plotted:
+        fm._plotdata[feature]
+    return fm
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--features", type=int, default=400)
+    parser.add_argument("--plotted", type=int, default=4, help="features looked up after loading")
+    args = parser.parse_args()
+
+    dataframe = make_wide_sheet(args.rows, args.features)
+    plotted = ["feature{}".format(i) for i in range(args.plotted)]
+
+    print("{} rows x {} features, {} plotted".format(args.rows, args.features, args.plotted))
+    print("{:>8} {:>10} {:>12} {:>14}".format("store", "load (s)", "peak (MiB)", "retained (MiB)"))
+    for name, func in [("eager", lambda: eager(dataframe)), ("lazy", lambda: lazy(dataframe, plotted))]:
+        seconds, peak, retained = measure(func)
+        print("{:>8} {:>10.3f} {:>12.1f} {:>14.1f}".format(name, seconds, peak / 2**20, retained / 2**20))
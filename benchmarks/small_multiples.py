@@ -0,0 +1,48 @@
+"""
+Time a grid of panels drawn with FeatureMap.draw_panels against the same maps drawn one at a
+time, at the same number of pixels per map.
+
+    python -m benchmarks.small_multiples [--rows 2000] [--panels 4 9] [--shapefile FILE]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+
+from mattang import FeatureMap
+
+from .synthetic import make_languages
+
+
+FEATURES = ["word_order", "tone", "vowels", "consonants"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--panels", type=int, nargs="+", default=[4, 9])
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--shapefile", help="basemap to use instead of the Natural Earth coastlines")
+    args = parser.parse_args()
+
+    fm = FeatureMap()
+    fm.shapefile = args.shapefile
+    fm.load_data(make_languages(args.rows))
+    print("{:>7} {:>10} {:>10}".format("panels", "separate", "grid"))
+    with tempfile.TemporaryDirectory() as tmp:
+        # Warm up the imports and caches both ways share
+        fm.draw(os.path.join(tmp, "warm.png"), FEATURES[:1], dpi=args.dpi, seed=0)
+        for n in args.panels:
+            panels = [[FEATURES[i % len(FEATURES)]] for i in range(n)]
+            start = time.perf_counter()
+            for i, panel in enumerate(panels):
+                fm.draw(os.path.join(tmp, "map{}.png".format(i)), panel, dpi=args.dpi, seed=0, size=(4, 3))
+            separate = time.perf_counter() - start
+
+            start = time.perf_counter()
+            fm.draw_panels(os.path.join(tmp, "grid.png"), panels, dpi=args.dpi, seed=0)
+            grid = time.perf_counter() - start
+            print("{:>7} {:>9.2f}s {:>9.2f}s".format(n, separate, grid), flush=True)
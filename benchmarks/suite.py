@@ -0,0 +1,186 @@
+"""
+Time Mattang's hot paths on synthetic datasets from 100 to 100,000 languages, and report
+throughput and peak memory as JSON so runs can be compared.
+
+    python -m benchmarks.suite [--sizes 100 1000 10000 100000] [--output results.json]
+    python -m benchmarks.suite --baseline results.json [--tolerance 0.25]
+
+With --baseline, every measurement is compared to the same one in an earlier run's output.
+The script exits with an error if any of them got slower, or used more memory, by more
+than --tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from mattang import FeatureMap
+from mattang.geometry import build_isogloss, buffer_convex_hull, is_colinear, spatial
+
+from .synthetic import make_dataset
+
+
+FEATURES = ["discrete0", "discrete2", "continuous0"]
+COLOURS = ["tab10", "viridis", "plasma"]
+ISOGLOSSES = ["discrete1"]
+
+
+def measure(func, repeat, min_time):
+    """Best mean wall time per call of `func` over `repeat` rounds, each of enough calls to
+    take `min_time` seconds, and the peak memory traced during one more call
+    """
+    start = time.perf_counter()
+    func()
+    number = max(1, int(min_time / max(time.perf_counter() - start, 1e-9)))
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def loaded_map(dataframe, shapefile=None):
+    fm = FeatureMap()
+    fm.shapefile = shapefile
+    fm.load_data(dataframe)
+    return fm
+
+
+def bench_load_data(dataframe, args):
+    def run():
+        fm = loaded_map(dataframe)
+        # Plotting metadata is built lazily, on first use
+        for feature in FEATURES + ISOGLOSSES:
+            fm._plotdata[feature]
+    return run
+
+
+def bench_is_colinear(dataframe, args):
+    points = dataframe[["longitude", "latitude"]].dropna().to_numpy()
+    return lambda: is_colinear(points)
+
+
+def bench_build_isogloss(dataframe, args):
+    points = dataframe[["longitude", "latitude"]].dropna().to_numpy()
+    return lambda: build_isogloss(points)
+
+
+def bench_buffer_convex_hull(dataframe, args):
+    hull = spatial.ConvexHull(dataframe[["longitude", "latitude"]].dropna().to_numpy())
+    return lambda: buffer_convex_hull(hull, .1, 16)
+
+
+def bench_draw_pie_markers(dataframe, args):
+    fm = loaded_map(dataframe)
+    colours = fm._check_input(FEATURES, COLOURS)
+    fig, axis = plt.subplots(1, 1, subplot_kw=dict(projection=fm.data_crs))
+
+    def run():
+        fm.fig, fm.axis = fig, axis
+        fm._reset_layers()
+        fm._draw_pie_markers(FEATURES, colours)
+        for artist in fm.artists:
+            artist.remove()
+    return run
+
+
+def bench_draw(dataframe, args):
+    fm = loaded_map(dataframe, args.shapefile)
+    filename = os.path.join(args.tmp, "map.png")
+    return lambda: fm.draw(filename, FEATURES, COLOURS, ISOGLOSSES, dpi=args.dpi)
+
+
+BENCHMARKS = {
+    "load_data": bench_load_data,
+    "is_colinear": bench_is_colinear,
+    "build_isogloss": bench_build_isogloss,
+    "buffer_convex_hull": bench_buffer_convex_hull,
+    "_draw_pie_markers": bench_draw_pie_markers,
+    "draw": bench_draw,
+}
+
+
+def compare(results, baseline, tolerance):
+    """Measurements in `results` more than `tolerance` slower or bigger than in `baseline`"""
+    before = {(r["name"], r["rows"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = before.get((result["name"], result["rows"]))
+        if old is None:
+            continue
+        for field in ("seconds", "peak_bytes"):
+            if result[field] > old[field] * (1 + tolerance):
+                regressions.append("{} at {} rows: {} {:.4g} -> {:.4g} ({:+.0%})".format(
+                    result["name"], result["rows"], field, old[field], result[field], result[field] / old[field] - 1,
+                ))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run, all by default")
+    parser.add_argument("--repeat", type=int, default=3, help="timed rounds of each benchmark, the fastest counts")
+    parser.add_argument("--min-time", type=float, default=.2, help="seconds each round should take at least")
+    parser.add_argument("--dpi", type=int, default=100, help="resolution of the end to end draws")
+    parser.add_argument("--shapefile", help="basemap to use instead of the Natural Earth coastlines")
+    parser.add_argument("--output", help="file to write the results to as JSON, printed if not given")
+    parser.add_argument("--baseline", help="results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=.25, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as args.tmp:
+        for n in args.sizes:
+            dataframe = make_dataset(n)
+            for name in args.only or BENCHMARKS:
+                seconds, peak = measure(BENCHMARKS[name](dataframe, args), args.repeat, args.min_time)
+                results.append({
+                    "name": name,
+                    "rows": n,
+                    "seconds": seconds,
+                    "rows_per_second": n / seconds if seconds else None,
+                    "peak_bytes": peak,
+                })
+                print("{:<20} {:>7} rows {:>10.4f}s {:>14.0f} rows/s {:>9.1f} MiB".format(
+                    name, n, seconds, n / seconds if seconds else 0, peak / 2**20,
+                ), file=sys.stderr, flush=True)
+            plt.close("all")
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": numpy.__version__,
+            "matplotlib": matplotlib.__version__,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    else:
+        print(json.dumps(report, indent=1))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            sys.exit("Regressions against {}:\n{}".format(args.baseline, "\n".join(regressions)))
+        print("No regressions against {}".format(args.baseline), file=sys.stderr)
@@ -0,0 +1,85 @@
+"""
+Synthetic language datasets for benchmarking
+"""
+import numpy
+from pandas import DataFrame, concat
+
+
+def make_languages(n, seed=0):
+    """Build a dataframe of `n` languages scattered over Melanesia, with a few discrete and
+    continuous feature columns.
+    """
+    rng = numpy.random.default_rng(seed)
+    return DataFrame({
+        "name": ["language{}".format(i) for i in range(n)],
+        "latitude": rng.uniform(-12, 2, n),
+        "longitude": rng.uniform(128, 165, n),
+        "word_order": rng.choice(["SOV", "SVO", "VSO", "VOS", "OVS"], n),
+        "tone": rng.choice(["yes", "no"], n),
+        "vowels": rng.integers(3, 15, n).astype("int64"),
+        "consonants": rng.normal(20, 5, n),
+    })
+
+
+def make_wide_sheet(n, n_features, seed=0):
+    """Build a dataframe of `n` languages with `n_features` feature columns, alternating
+    between discrete and continuous features.
+    """
+    rng = numpy.random.default_rng(seed)
+    dataframe = make_languages(n, seed)[["name", "latitude", "longitude"]]
+    columns = {}
+    for i in range(n_features):
+        if i % 2:
+            columns["feature{}".format(i)] = rng.normal(0, 1, n)
+        else:
+            categories = ["value{}".format(j) for j in range(2 + i % 10)]
+            columns["feature{}".format(i)] = rng.choice(categories, n)
+    return concat([dataframe, DataFrame(columns)], axis=1)
+
+
+# Centre longitude and latitude, and spread in degrees, of some areas of high language density
+HOTSPOTS = [
+    (142, -5, 5, 2.5),  # New Guinea
+    (160, -8, 5, 3),    # Island Melanesia
+    (10, 7, 6, 3),      # Nigeria and Cameroon
+    (-65, -6, 9, 7),    # Amazonia
+    (98, 20, 6, 5),     # Mainland Southeast Asia
+    (-98, 18, 5, 3),    # Mesoamerica
+    (80, 24, 8, 6),     # South Asia
+    (45, 42, 3, 1.5),   # Caucasus
+]
+
+# Category counts of the discrete features, in turn
+CATEGORY_COUNTS = [2, 5, 12, 40]
+
+
+def make_dataset(n, seed=0, discrete=4, continuous=2, nan_coordinates=.01, missing=.05):
+    """Build a dataframe of `n` languages clustered around real language hotspots, with
+    `discrete` categorical features ("discrete0", ...) of CATEGORY_COUNTS categories in turn,
+    and `continuous` normally distributed ones ("continuous0", ...).
+    `nan_coordinates` : fraction of languages with no location
+    `missing` : fraction of missing values in each feature
+    """
+    rng = numpy.random.default_rng(seed)
+    spots = numpy.array(HOTSPOTS)[rng.integers(0, len(HOTSPOTS), n)]
+    longitudes = rng.normal(spots[:, 0], spots[:, 2])
+    latitudes = numpy.clip(rng.normal(spots[:, 1], spots[:, 3]), -85, 85)
+    unlocated = rng.random(n) < nan_coordinates
+    longitudes[unlocated] = numpy.nan
+    latitudes[unlocated] = numpy.nan
+
+    columns = {
+        "name": ["language{}".format(i) for i in range(n)],
+        "latitude": latitudes,
+        "longitude": longitudes,
+    }
+    for i in range(discrete):
+        count = CATEGORY_COUNTS[i % len(CATEGORY_COUNTS)]
+        values = numpy.array(["value{}".format(j) for j in range(count)], dtype=object)[rng.integers(0, count, n)]
+        values[rng.random(n) < missing] = None
+        columns["discrete{}".format(i)] = values
+    for i in range(continuous):
+        values = rng.normal(10 * i, 1 + i, n)
+        values[rng.random(n) < missing] = numpy.nan
+        columns["continuous{}".format(i)] = values
+    return DataFrame(columns)
@@ -0,0 +1,48 @@
+"""
+Compare the file size and write time of SVG and PDF maps saved normally, in compact mode, and
+with the markers rasterized.
+
+    python -m benchmarks.vector_export [--rows 1000 10000] [--marker-dpi 150] [--shapefile FILE]
+"""
+import argparse
+import os
+import tempfile
+
+import matplotlib
+matplotlib.use("Agg")
+
+from mattang import FeatureMap
+
+from .synthetic import make_languages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--marker-dpi", type=int, default=150, help="resolution of the rasterized markers")
+    parser.add_argument("--shapefile", help="basemap to use instead of the Natural Earth coastlines")
+    args = parser.parse_args()
+    modes = {
+        "default": {},
+        "compact": {"compact": True},
+        "rasterized": {"compact": True, "marker_dpi": args.marker_dpi},
+    }
+
+    print("{:>8} {:>6} {:>11} {:>10} {:>8}".format("rows", "format", "mode", "KiB", "save"))
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.rows:
+            fm = FeatureMap()
+            fm.shapefile = args.shapefile
+            fm.load_data(make_languages(n))
+            for fmt in ("svg", "pdf"):
+                filename = os.path.join(tmp, "map." + fmt)
+                for mode, options in modes.items():
+                    metrics = fm.draw(
+                        filename, ["word_order", "tone", "vowels"], ["tab10", "viridis", "plasma"], ["tone"],
+                        dpi=args.dpi, **options
+                    )
+                    seconds = metrics.stages["save"] + metrics.stages.get("compact", 0)
+                    print("{:>8} {:>6} {:>11} {:>10.0f} {:>7.2f}s".format(
+                        n, fmt, mode, os.path.getsize(filename) / 1024, seconds,
+                    ), flush=True)
@@ -16,38 +16,92 @@ the coordinates of the languages in the data
 - Attempt to guess the separator of a CSV and support MS Excel files and similar
 """
 import argparse
-import os
 
-from cartopy.io.shapereader import Reader
 from os.path import exists
-from pandas import read_csv
 
-from mattang.featuremap import FeatureMap, MattangError
+from mattang.cache import RenderCache
+from mattang.export import export_format
+from mattang.featuremap import FeatureMap
+from mattang.sheets import read_sheet
 
 parser = argparse.ArgumentParser()
 parser.add_argument("filename", nargs="?")
-parser.add_argument("-f") # Features
-parser.add_argument("-c")
-parser.add_argument("-i")
-parser.add_argument("-s") # Shapefile name, folder is mounted in /shape
+parser.add_argument("-f", "--features")
+parser.add_argument("-c", "--colours")
+parser.add_argument("-i", "--isoglosses")
+parser.add_argument("-s", "--shapefile") # Shapefile name, folder is mounted in /shape
+parser.add_argument("--dpi", type=int)
+parser.add_argument("--size", help="figure size in inches, WIDTHxHEIGHT")
+parser.add_argument("--preset", help="named output settings, e.g. preview")
+parser.add_argument("--preview", action="store_true", help="same as --preset preview")
+parser.add_argument("--memory-budget", type=float, help="most MiB of raster to render at once")
+parser.add_argument("--aggregate", nargs="?", const=True, type=float, help="merge markers within RADIUS points, a marker's width if not given")
+parser.add_argument("--seed", type=int, help="pick the same random colours every time")
+parser.add_argument("--compact", action="store_true", help="write smaller, faster SVG and PDF maps")
+parser.add_argument("--marker-dpi", type=int, help="rasterize the markers of SVG and PDF maps at this resolution")
+parser.add_argument("--metrics", action="store_true", help="print the render's timings as a line of JSON")
+parser.add_argument("--profile", action="store_true", help="save cProfile statistics of the render next to the map")
+parser.add_argument("--tiles", help="render a ZMIN-ZMAX zoom range of web map tiles into the folder filename")
+parser.add_argument("--workers", type=int, help="number of processes to render tiles with")
 
 args = parser.parse_args()
 
-features = args.f.split(",") if args.f else None
-colours = args.c.split(",") if args.c else None
-isoglosses = args.i.split(",") if args.i else None
+features = args.features.split(",") if args.features else None
+colours = args.colours.split(",") if args.colours else None
+isoglosses = args.isoglosses.split(",") if args.isoglosses else None
 
-df = read_csv("/in", sep="\t")
+# Only read the columns that are going to be mapped
+df = read_sheet("/in", (features or []) + (isoglosses or []) if features else None)
 fm = FeatureMap()
 
 if exists("/shape"):
-    fm.init_map(shapefile="/shape/" + args.s)
+    fm.shapefile = "/shape/" + args.shapefile
+
+if exists("/cache"):
+    fm.render_cache = RenderCache("/cache")
 
 fm.load_data(df)
-fm.draw(
-    "/out/" + args.filename,
-    features=features,
-    colours=colours,
-    isoglosses=isoglosses,
-)
 
+if args.tiles:
+    zmin, zmax = (int(z) for z in args.tiles.split("-"))
+    results = fm.draw_tiles(
+        "/out/" + args.filename,
+        features=features,
+        colours=colours,
+        isoglosses=isoglosses or [],
+        zooms=range(zmin, zmax + 1),
+        workers=args.workers,
+        seed=args.seed,
+    )
+    for z, tiles in results.items():
+        errors = [t for t in tiles if t.error]
+        print("Zoom {}: {} tiles{}".format(z, len(tiles), "" if tiles else " (up to date)"))
+        for t in errors:
+            print("  {}: {}".format(t.filename, t.error))
+elif export_format(args.filename):
+    count = fm.export(
+        "/out/" + args.filename,
+        features=features,
+        colours=colours,
+        isoglosses=isoglosses or [],
+        seed=args.seed,
+    )
+    print("Exported {} features".format(count))
+else:
+    metrics = fm.draw(
+        "/out/" + args.filename,
+        features=features,
+        colours=colours,
+        isoglosses=isoglosses,
+        dpi=args.dpi,
+        size=[float(x) for x in args.size.split("x")] if args.size else None,
+        preset="preview" if args.preview else args.preset,
+        memory_budget=args.memory_budget * 2**20 if args.memory_budget else None,
+        aggregate=args.aggregate or False,
+        seed=args.seed,
+        profile="/out/" + args.filename + ".prof" if args.profile else None,
+        compact=args.compact,
+        marker_dpi=args.marker_dpi,
+    )
+    if args.metrics:
+        print(metrics.to_json())
@@ -2,12 +2,20 @@
 """
 Wrapper script to run Mattang CLI from the docker image
 Isaac Stead 2021
+
+With --server, the map is instead rendered by an already running render server (see
+mattang/server.py), which skips the container and interpreter startup for every map.
+
+An outfile ending in .geojson, .geojsons, .geojsonl or .fgb gets the map's data instead of a
+picture, see FeatureMap.export.
 """
 import argparse
-import docker
+import json
 
+from os import makedirs
 from os.path import abspath, dirname, basename
-from docker.types import Mount
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
 
 IMAGE = "mattang:latest"
 
@@ -18,28 +26,105 @@ parser.add_argument("--features", help="spreadsheet columns to be mapped")
 parser.add_argument("--colours", help="colours to use for mapping features")
 parser.add_argument("--isoglosses", help="features to draw isoglosses around")
 parser.add_argument("--shapefile", help="shapefile to draw on map")
+parser.add_argument("--dpi", type=int, help="output resolution")
+parser.add_argument("--size", help="figure size in inches, WIDTHxHEIGHT")
+parser.add_argument("--preset", help="named output settings: preview, screen or print")
+parser.add_argument("--preview", action="store_true", help="quick low resolution render")
+parser.add_argument("--memory-budget", type=float, help="most MiB of raster to render at once")
+parser.add_argument("--aggregate", nargs="?", const=True, type=float, help="merge markers within RADIUS points, a marker's width if not given")
+parser.add_argument("--seed", type=int, help="pick the same random colours every time")
+parser.add_argument("--compact", action="store_true", help="write smaller, faster SVG and PDF maps")
+parser.add_argument("--marker-dpi", type=int, help="rasterize the markers of SVG and PDF maps at this resolution")
+parser.add_argument("--cache", help="folder to keep rendered maps in, to skip rendering them again")
+parser.add_argument("--metrics", action="store_true", help="print the render's timings as a line of JSON")
+parser.add_argument("--profile", action="store_true", help="save cProfile statistics of the render to outfile.prof")
+parser.add_argument("--tiles", help="render a ZMIN-ZMAX zoom range of web map tiles into the folder outfile")
+parser.add_argument("--workers", type=int, help="number of processes to render tiles with")
+parser.add_argument("--server", help="URL of a running render server to use instead of docker")
 # parser.add_argument("--debug", help="See what container Python process writes to stdout")
 
 args = parser.parse_args()
 
-command = ["python3 ./container_run.py"]
-mounts = []
 
-# Prepare the input files and output directory to be bind mounted into the container
-mounts.append(Mount("/in", abspath(args.infile), type="bind", read_only=True))
-mounts.append(Mount("/out", dirname(abspath(args.outfile)), type="bind"))
-command.append(basename(args.outfile))
+def split(value):
+    return value.split(",") if value else None
+
+
+def render_with_server(args):
+    """Send the map to a running render server, see mattang/server.py"""
+    request = {
+        "infile": abspath(args.infile),
+        "outfile": abspath(args.outfile),
+        "features": split(args.features),
+        "colours": split(args.colours),
+        "isoglosses": split(args.isoglosses),
+        "shapefile": abspath(args.shapefile) if args.shapefile else None,
+        "options": {
+            "dpi": args.dpi,
+            "size": [float(x) for x in args.size.split("x")] if args.size else None,
+            "preset": "preview" if args.preview else args.preset,
+            "memory_budget": args.memory_budget * 2**20 if args.memory_budget else None,
+            "aggregate": args.aggregate or False,
+            "seed": args.seed,
+            "profile": abspath(args.outfile) + ".prof" if args.profile else None,
+            "compact": args.compact,
+            "marker_dpi": args.marker_dpi,
+        },
+    }
+    try:
+        response = urlopen(Request(
+            args.server.rstrip("/") + "/render",
+            data=json.dumps(request).encode(),
+            headers={"Content-Type": "application/json"},
+        ))
+    except HTTPError as error:
+        response = error
+    result = json.loads(response.read())
+    if result.get("error"):
+        raise SystemExit("Render failed: {}".format(result["error"]))
+    if args.metrics:
+        print(json.dumps(result["metrics"]))
+
+
+def render_with_docker(args):
+    import docker
+    from docker.types import Mount
+
+    command = ["python3 ./container_run.py"]
+    mounts = []
+
+    # Prepare the input files and output directory to be bind mounted into the container
+    mounts.append(Mount("/in", abspath(args.infile), type="bind", read_only=True))
+    mounts.append(Mount("/out", dirname(abspath(args.outfile)), type="bind"))
+    command.append(basename(args.outfile))
+
+    # Mount optional files / folders
+    if args.shapefile:
+        mounts.append(Mount("/shape", dirname(abspath(args.shapefile)), type="bind"))
+    if args.cache:
+        makedirs(args.cache, exist_ok=True)
+        mounts.append(Mount("/cache", abspath(args.cache), type="bind"))
+
+    # Add the optional arguments to the command string
+    for arg, value in vars(args).items():
+        if value is not None and value is not False and arg not in ["infile", "outfile", "server", "cache"]:
+            option = "--" + arg.replace("_", "-")
+            if value is True:
+                command.append(option)
+                continue
+            if arg == "shapefile":
+                value = basename(value)
+            command.append("{} {}".format(option, value))
 
-# Mount optional files / folders
-if args.shapefile:
-    mounts.append(Mount("/shape", dirname(abspath(args.shapefile)), type="bind"))
+    client = docker.from_env()
+    output = client.containers.run(IMAGE, command=" ".join(command), mounts=mounts)
+    if args.metrics:
+        print(output.decode(), end="")
 
-# Add the optional arguments to the command string
-for arg, value in vars(args).items():
-    if value and arg not in ["infile", "outfile"]:
-        if arg == "shapefile":
-            value = basename(value)
-        command.append("-{} {}".format(arg[0], value))
 
-client = docker.from_env()
-client.containers.run(IMAGE, command=" ".join(command), mounts=mounts)
+if args.server and args.tiles:
+    raise SystemExit("The render server can't render tiles, leave out --server")
+if args.server:
+    render_with_server(args)
+else:
+    render_with_docker(args)
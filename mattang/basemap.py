@@ -0,0 +1,165 @@
+import hashlib
+import os
+
+from collections import OrderedDict
+
+from .cache import evict
+
+
+# Natural Earth coastline scales, coarsest first, with the smallest map resolution in degrees
+# per pixel each is detailed enough for. Their detail is about 0.1mm at their nominal scale,
+# e.g. 11km for 1:110 million.
+COASTLINE_SCALES = [("110m", .1), ("50m", .045), ("10m", 0)]
+
+
+def coastline_scale(degrees_per_pixel):
+    """The coarsest Natural Earth scale with detail down to `degrees_per_pixel`"""
+    for scale, resolution in COASTLINE_SCALES:
+        if degrees_per_pixel >= resolution:
+            return scale
+    return COASTLINE_SCALES[-1][0]
+
+
+def coastline_path(scale):
+    """Path to the Natural Earth coastline shapefile at `scale`, downloaded if it isn't there"""
+    from cartopy.io import shapereader
+    return shapereader.natural_earth(resolution=scale, category="physical", name="coastline")
+
+
+class ShapefileCache:
+    """Parsed shapefile geometries, clipped to the map extent and simplified to the output
+    resolution, so drawing the same basemap again skips parsing and reprojection.
+    Entries are keyed by the shapefile's path and modification time, the projection, the
+    extent and the resolution. The most recently used `maxsize` entries are kept in memory,
+    and if `directory` is set every entry is also saved there as WKB for other processes,
+    keeping the most recently used up to `max_bytes`. Each shapefile is only parsed once,
+    into a spatial index that every extent is clipped from, see `source`. The most recently
+    used `max_sources` of those are kept in memory.
+    """
+    def __init__(self, directory=None, maxsize=16, max_bytes=2**28, max_sources=4):
+        self.directory = directory
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.max_sources = max_sources
+        self._entries = OrderedDict()
+        self._sources = OrderedDict()
+
+    def key(self, shapefile, projection, extent=None, pixels=None):
+        stat = os.stat(shapefile)
+        return (
+            os.path.abspath(shapefile),
+            stat.st_mtime_ns,
+            stat.st_size,
+            projection.proj4_init,
+            tuple(extent) if extent else None,
+            pixels,
+        )
+
+    def geometries(self, shapefile, projection, extent=None, pixels=None):
+        """Return the geometries of `shapefile` in `projection`.
+        `extent` : (x0, x1, y0, y1) in projection coordinates to clip the geometries to
+        `pixels` : width of the map in pixels, to simplify away detail smaller than a pixel
+        """
+        key = self.key(shapefile, projection, extent, pixels)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        path = self._path(key, "clipped")
+        if path and os.path.exists(path):
+            geometries = self._read(path)
+            os.utime(path) # Mark as recently used
+        else:
+            geometries = self._load(shapefile, extent, pixels)
+            if path:
+                self._save(path, geometries)
+                evict(os.path.dirname(path), self.max_bytes)
+
+        self._entries[key] = geometries
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return geometries
+
+    def source(self, shapefile):
+        """Return all the geometries of `shapefile`, unclipped and unsimplified, and an STRtree
+        over them. They're parsed once per process, or read from `directory` if they were
+        saved there before.
+        """
+        stat = os.stat(shapefile)
+        key = (os.path.abspath(shapefile), stat.st_mtime_ns, stat.st_size)
+        if key in self._sources:
+            self._sources.move_to_end(key)
+            return self._sources[key]
+
+        from shapely.strtree import STRtree
+
+        path = self._path(key)
+        if path and os.path.exists(path):
+            geometries = self._read(path)
+        else:
+            from cartopy.io.shapereader import Reader
+            geometries = [g for g in Reader(shapefile).geometries() if g is not None and not g.is_empty]
+            if path:
+                self._save(path, geometries)
+        source = self._sources[key] = (geometries, STRtree(geometries) if geometries else None)
+        while len(self._sources) > self.max_sources:
+            self._sources.popitem(last=False)
+        return source
+
+    def clear(self):
+        self._entries.clear()
+        self._sources.clear()
+
+    def _load(self, shapefile, extent, pixels):
+        from shapely.geometry import GeometryCollection, box
+
+        # Shapefile coordinates are taken to be in the map projection already, as ShapelyFeature
+        # was always given the map projection as their CRS
+        geometries, tree = self.source(shapefile)
+        if not geometries:
+            return []
+        bounds = GeometryCollection(geometries).bounds
+        if extent:
+            x0, x1, y0, y1 = extent
+            # Clip a little outside the extent, so the cut edges are hidden outside the map frame
+            margin = max(x1 - x0, y1 - y0) * .05
+            clip = box(x0 - margin, y0 - margin, x1 + margin, y1 + margin)
+            hits = tree.query(clip)
+            # Shapely 2 returns indices, older versions the geometries themselves
+            candidates = [geometries[i] for i in hits] if len(hits) and not hasattr(hits[0], "geom_type") else list(hits)
+            geometries = [g.intersection(clip) for g in candidates if g.intersects(clip)]
+            bounds = (x0, y0, x1, y1)
+        if pixels:
+            # Detail smaller than half a pixel can't be seen at the output resolution
+            tolerance = (bounds[2] - bounds[0]) / pixels / 2
+            geometries = [g.simplify(tolerance, preserve_topology=True) for g in geometries]
+        return [g for g in geometries if not g.is_empty]
+
+    def _path(self, key, folder=""):
+        # Clipped entries go in their own folder, so evicting them leaves the parsed sources
+        if not self.directory:
+            return None
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, folder, "{}-{}.wkb".format(os.path.basename(key[0]), digest))
+
+    def _read(self, path):
+        from shapely import wkb
+        with open(path, "rb") as f:
+            return list(wkb.loads(f.read()).geoms)
+
+    def _save(self, path, geometries):
+        from shapely import wkb
+        from shapely.geometry import GeometryCollection
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first, so other processes never read a partial cache file
+        temp = "{}.{}.tmp".format(path, os.getpid())
+        with open(temp, "wb") as f:
+            f.write(wkb.dumps(GeometryCollection(geometries)))
+        os.replace(temp, path)
+
+
+# Shared by all FeatureMaps unless they're given their own. The Docker image precomputes the
+# Natural Earth coastlines into MATTANG_BASEMAP_CACHE when it's built, see mattang.precompute.
+shapefile_cache = ShapefileCache(os.environ.get("MATTANG_BASEMAP_CACHE"))
+
@@ -0,0 +1,83 @@
+import hashlib
+import os
+import shutil
+
+
+# Bump when rendering changes, so maps cached by older versions aren't served
+CACHE_VERSION = 2
+
+
+def inputs_hash(dataframe, columns, *params):
+    """Hash of the `columns` of `dataframe` and any other parameters that affect a render"""
+    from pandas.util import hash_pandas_object
+    digest = hashlib.sha1()
+    digest.update(hash_pandas_object(dataframe[list(columns)], index=False).to_numpy().tobytes())
+    digest.update(repr(params).encode())
+    return digest.hexdigest()
+
+
+def evict(directory, max_bytes=None, max_entries=None):
+    """Delete the least recently modified files in `directory` until there are at most
+    `max_entries` of them, taking at most `max_bytes`
+    """
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+    entries.sort(reverse=True)
+
+    total = 0
+    for count, (_, size, path) in enumerate(entries, 1):
+        total += size
+        over_size = max_bytes is not None and total > max_bytes
+        over_count = max_entries is not None and count > max_entries
+        if over_size or over_count:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass # Evicted by another process
+
+
+class RenderCache:
+    """Rendered maps saved under `directory`, named by a hash of everything that went into
+    them, so drawing the same map again only copies a file.
+    Once the cache holds more than `max_bytes` or `max_entries` maps, the least recently used
+    are deleted. Use is tracked by file modification time, so several processes can share a
+    cache directory.
+    """
+    def __init__(self, directory, max_bytes=2**30, max_entries=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+    def _path(self, key, fmt):
+        return os.path.join(self.directory, "{}.{}".format(key, fmt))
+
+    def get(self, key, filename):
+        """Copy the map cached under `key` to `filename`, returning whether there was one"""
+        path = self._path(key, os.path.splitext(str(filename))[1][1:].lower())
+        try:
+            shutil.copyfile(path, filename)
+        except FileNotFoundError:
+            return False
+        os.utime(path)
+        return True
+
+    def put(self, key, filename):
+        """Add the map at `filename` to the cache under `key`"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key, os.path.splitext(str(filename))[1][1:].lower())
+        # Copy to a temporary file first, so other processes never read a partial map
+        temp = "{}.{}.tmp".format(path, os.getpid())
+        shutil.copyfile(filename, temp)
+        os.replace(temp, path)
+        self.evict()
+
+    def evict(self):
+        """Delete the least recently used maps until the cache is within its limits"""
+        evict(self.directory, self.max_bytes, self.max_entries)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
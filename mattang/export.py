@@ -0,0 +1,80 @@
+"""
+Streaming writers of map data, for consumers that draw maps themselves, see FeatureMap.export.
+Features are GeoJSON-like dicts, written one at a time as they're generated.
+"""
+import json
+import os
+
+
+# Export format of each file extension
+EXPORT_FORMATS = {
+    ".geojson": "geojson",      # A FeatureCollection
+    ".geojsons": "geojsonseq",  # RFC 8142 GeoJSON text sequence, each feature after a record separator
+    ".geojsonl": "geojsonl",    # One feature per line
+    ".fgb": "flatgeobuf",       # Needs fiona
+}
+
+
+def export_format(filename):
+    """Export format of `filename` from its extension, or None if it isn't one"""
+    return EXPORT_FORMATS.get(os.path.splitext(str(filename))[1].lower())
+
+
+def hex_colours(lut):
+    """"#rrggbb" strings of the entries of a colour_lut, with None for its last, missing value
+    entry
+    """
+    rgb = (lut[:-1, :3] * 255).round().astype(int)
+    return ["#{:02x}{:02x}{:02x}".format(*c) for c in rgb] + [None]
+
+
+def write_geojson(filename, features):
+    """Write `features` to `filename` as a GeoJSON FeatureCollection. Returns the number written."""
+    count = 0
+    with open(filename, "w") as f:
+        f.write('{"type": "FeatureCollection", "features": [\n')
+        for feature in features:
+            if count:
+                f.write(",\n")
+            f.write(json.dumps(feature))
+            count += 1
+        f.write("\n]}\n")
+    return count
+
+
+def write_geojson_seq(filename, features, separator="\x1e"):
+    """Write `features` to `filename` one per line, each after `separator`. Returns the number
+    written.
+    """
+    count = 0
+    with open(filename, "w") as f:
+        for feature in features:
+            f.write(separator)
+            f.write(json.dumps(feature))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def write_flatgeobuf(filename, features, schema):
+    """Write `features` to `filename` as FlatGeobuf, with fiona. Returns the number written.
+    `schema` : fiona type of each property, e.g. {"name": "str"}. Values of "str" properties
+    are converted to strings.
+    """
+    import fiona
+
+    text = [name for name, kind in schema.items() if kind == "str"]
+    count = 0
+    with fiona.open(
+        filename, "w", driver="FlatGeobuf", crs="EPSG:4326",
+        schema={"geometry": "Unknown", "properties": schema},
+    ) as collection:
+        for feature in features:
+            properties = feature["properties"]
+            for name in text:
+                value = properties.get(name)
+                if value is not None and not isinstance(value, str):
+                    properties[name] = str(value)
+            collection.write(feature)
+            count += 1
+    return count
@@ -1,31 +1,83 @@
+import cProfile
+import itertools
+import os
 import random
+import shutil
+import time
 
 import numpy
-from pandas import DataFrame
 
-import matplotlib.pyplot as plt
-from matplotlib.patches import Circle
-from matplotlib import cm
-from matplotlib import colors
-from mpl_toolkits.axes_grid1 import make_axes_locatable
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-from cartopy.io.shapereader import Reader
-from cartopy.feature import ShapelyFeature
+from .lazy import LazyModule
+from .basemap import coastline_path, coastline_scale, shapefile_cache
+from .raster import VECTOR_FORMATS, save_in_strips, write_png
+from .cache import CACHE_VERSION, inputs_hash
+from .export import EXPORT_FORMATS, export_format, hex_colours, write_flatgeobuf, write_geojson, write_geojson_seq
+from .metrics import RenderMetrics
+from .tiles import line_tiles, point_tiles, tile_bounds
+from .geometry import build_isoglosses, grid_clusters, group_bounds, group_segments, pie_marker, pie_wedge, PointIndex
 
-from collections import namedtuple
-
-from .geometry import midpoint, points_circumference, buffer_convex_hull, build_isogloss
+# The plotting stack takes seconds to import, so it's only imported once a map is drawn
+plt = LazyModule("matplotlib.pyplot")
+cm = LazyModule("matplotlib.cm")
+colors = LazyModule("matplotlib.colors")
+mcollections = LazyModule("matplotlib.collections")
+mpath = LazyModule("matplotlib.path")
+mmarkers = LazyModule("matplotlib.markers")
+axes_grid1 = LazyModule("mpl_toolkits.axes_grid1")
+ccrs = LazyModule("cartopy.crs")
+cfeature = LazyModule("cartopy.feature")
+pandas = LazyModule("pandas")
 
 
 DPI = 1200
 
+# Area of a language's pie marker, in square points
+MARKER_SIZE = 250
+
+# Languages and isoglosses this far outside the map extent, as a fraction of its size, are
+# left out of the drawing. Enough that markers cut by the map frame are still drawn.
+CULL_MARGIN = .1
+
+# Written into each zoom level directory by FeatureMap.draw_tiles, to skip it next time if
+# nothing has changed
+TILE_INPUTS_FILE = ".mattang-inputs"
+
+# Named output settings for FeatureMap.draw
+PRESETS = {
+    "preview": {"dpi": 100},
+    "screen": {"dpi": 200},
+    "print": {"dpi": DPI},
+}
+
 
 class MattangError(Exception):
     pass
 
 
+# Outcome of one map rendered by FeatureMap.draw_many. `error` is None if it succeeded, and
+# `metrics` are its RenderMetrics if it did
+RenderResult = namedtuple("RenderResult", ["filename", "seconds", "error", "metrics"])
+
+
+# Continuous features have a colour per two languages, so a table can take megabytes, and a
+# long running process sees many colourmaps and dataset sizes
+@lru_cache(maxsize=32)
+def colour_lut(colourmap, n):
+    """RGBA lookup table for `colourmap` resampled to `n` colours, indexed by the colour codes
+    computed in FeatureMap.load_data. The colourmap's "bad" colour is appended as entry -1, for
+    missing values. The 32 most recently used are kept.
+    """
+    cmap = plt.get_cmap(colourmap, n)
+    lut = cmap(numpy.arange(n))
+    lut = numpy.vstack([lut, cmap.get_bad()])
+    lut.flags.writeable = False
+    return lut
+
+
 class FeatureMap:
     """Visualise linguistic data from a spreadsheet.
     """
@@ -34,48 +86,120 @@ class FeatureMap:
         self.projection = None
         self.shapefile = None
         self.extent = None
+        self.workers = None # Processes used to build isoglosses
+        self.shapefile_cache = shapefile_cache
+        self.coastline_scale = None # "110m", "50m" or "10m", chosen from the map's resolution if not set
+        self.reuse_figure = False # Keep the figure and basemap between draws of the same map
+        self.incremental = False # Also keep the basemap as a raster and only draw the layers over it, see _save_incremental
+        self.max_backgrounds = 4 # Basemap rasters kept by incremental draws, one per map and layout
+        self.data_crs = None # Of the longitude and latitude columns, PlateCarree if not set
+        self.render_cache = None # RenderCache to reuse maps drawn before
+        self.hooks = [] # Called with the RenderMetrics of every draw
+        self.trace_memory = False # Measure peak memory of each stage of a draw, see RenderMetrics
+        self.fig = None
+        self.axis = None
+        self._basemap_key = None
+        self._backgrounds = OrderedDict()
+        self._reset_layers()
+
+    @property
+    def data_crs(self):
+        if self._data_crs is None:
+            self._data_crs = ccrs.PlateCarree()
+        return self._data_crs
+
+    @data_crs.setter
+    def data_crs(self, crs):
+        self._data_crs = crs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Release the figure and everything drawn on it, and the kept basemap rasters.
+        """
+        self._close_figure()
+        self._backgrounds = OrderedDict()
+
+    def _close_figure(self):
+        if self.fig is not None:
+            plt.close(self.fig)
+        self.fig = None
+        self.axis = None
+        self._basemap_key = None
+        self._reset_layers()
+
+    def _reset_layers(self):
+        # Markers, isoglosses and colourbars of the current draw
         self.discrete_markers = []
         self.continuous_markers = []
         self.colourbars = []
         self.contours = []
-        
-    def load_data(self, dataframe: DataFrame):
-        """Precompute various things needed to plot the supplied languages and their features.
+        self.artists = []
+
+    def _clear_layers(self):
+        """Remove everything the last draw added, leaving the basemap.
         """
-        self.dataframe = dataframe
-        self._plotdata = {}
-        self.projection = ccrs.PlateCarree()
+        for artist in self.artists:
+            artist.remove()
+        for bar in self.colourbars:
+            bar.ax.remove()
+        self.axis.set_axes_locator(None)
+        # So the next draw's markers autoscale the map from scratch
+        self.axis.ignore_existing_data_limits = True
+        self._reset_layers()
 
-        for feature in self.dataframe.columns:
-            data = self.dataframe[feature]
-            ndata = len(data)
-            try:
-                if self.dataframe.dtypes[feature] in ["float64", "int64"]:
-                    dtype = "continuous"
-                    dnorm = colors.Normalize(min(data), max(data))
-                    dgroups = self.dataframe.groupby(feature)
-                    drange = int(ndata / 2)
-                else:
-                    dtype = "discrete"
-                    dnorm = colors.BoundaryNorm([i for i in range(ndata)], ndata)
-                    dgroups = self.dataframe.groupby(feature)
-                    drange = len(dgroups)
-                    
-                self._plotdata[feature] = {"type": dtype, "norm": dnorm, "groups": dgroups, "range": drange,}
-            except TypeError as error:
-                # Some field types can have unhashable stuff that can't be groupby'd, so we skip them
-                print("Skipping feature {} due to error \"{}\"".format(feature, error))
+    def load_data(self, dataframe: "pandas.DataFrame"):
+        """Set the languages to plot. Plotting metadata for each feature is computed the
+        first time the feature is drawn, and the spatial index the first time it's needed.
+        """
+        from .plotdata import PlotData
+        self.dataframe = dataframe
+        self._plotdata = PlotData(dataframe)
+        self._index = None
+        self.projection = None
             
             
-    def init_map(self, shapefile="", extent=None, projection=ccrs.PlateCarree()):
-        """Set up map figure and axis.
+    def init_map(self, shapefile="", extent=None, projection=None, size=None, dpi=DPI):
+        """Set up map figure and axis. If reuse_figure or incremental is set and the map is the
+        same as last time, the existing figure is cleared back to its basemap instead.
+        `projection` : cartopy CRS of the map, PlateCarree if not given
+        `size` : figure (width, height) in inches, matplotlib's default if not given
+        `dpi` : output resolution, which sets how much basemap detail is kept
         """
+        key = (
+            shapefile,
+            tuple(extent) if extent else None,
+            projection,
+            tuple(size) if size else None,
+            dpi,
+            id(getattr(self, "dataframe", None)),
+        )
+        if (self.reuse_figure or self.incremental) and self.fig is not None and key == self._basemap_key:
+            self._clear_layers()
+            return
+
+        self._close_figure()
         self.projection = projection
-        self.fig, self.axis = plt.subplots(1, 1, subplot_kw=dict(projection=projection))
+        projection = projection or ccrs.PlateCarree()
+        self.fig, self.axis = plt.subplots(1, 1, figsize=size, subplot_kw=dict(projection=projection))
+        self._basemap_key = key
+        self._draw_basemap(shapefile, extent, projection, dpi)
 
+    def _draw_basemap(self, shapefile, extent, projection, dpi):
+        """Draw the shapefile, or the coastlines, on the axis and zoom it to `extent`. The
+        geometries come from shapefile_cache, so every axis of a figure shares them.
+        """
+        if extent:
+            self.axis.set_extent(extent, projection)
+            self.extent = extent
         if shapefile:
-            shape = ShapelyFeature(
-                Reader(shapefile).geometries(),
+            pixels = int(self.fig.get_size_inches()[0] * dpi)
+            shape = cfeature.ShapelyFeature(
+                self.shapefile_cache.geometries(shapefile, projection, extent, pixels),
                 projection,
                 edgecolor="k",
                 facecolor="none",
@@ -83,73 +207,322 @@ class FeatureMap:
             self.axis.add_feature(shape)
             self.shapefile = shapefile
         else:
-            self.axis.coastlines(resolution='50m', color='black', linewidth=1)
+            self._draw_coastlines(extent, projection, dpi)
+
+    def _coastline_bounds(self, extent, projection):
+        """(x0, x1, y0, y1) in data_crs of the area the map will show, to clip the coastlines
+        to, or None for the whole world. x1 is over 180 if the area crosses the antimeridian.
+        The axis has to be zoomed to `extent` already.
+        """
         if extent:
-            self.axis.set_extent(extent, projection)
-            self.extent = extent
+            if projection == self.data_crs:
+                return tuple(extent)
+            return self._visible_bounds()
+        if getattr(self, "dataframe", None) is None:
+            return None
+        # With no extent the map is autoscaled to the languages, so clip well outside them
+        x = self.dataframe["longitude"].to_numpy(dtype=float)
+        y = self.dataframe["latitude"].to_numpy(dtype=float)
+        if numpy.isnan(x).all() or numpy.isnan(y).all():
+            return None
+        x0, x1, y0, y1 = numpy.nanmin(x), numpy.nanmax(x), numpy.nanmin(y), numpy.nanmax(y)
+        margin = max(x1 - x0, y1 - y0, 1) * .25
+        return (
+            max(x0 - margin, -180.), min(x1 + margin, 180.), max(y0 - margin, -90.), min(y1 + margin, 90.)
+        )
+
+    def _visible_bounds(self, samples=50):
+        """Longitude and latitude bounds of the area the axis shows, from a grid of `samples`
+        by `samples` points over it. The longitudes are the shortest span around the globe
+        that covers them all, so a Pacific-centred map gives e.g. (140, 220, ...) rather than
+        the whole world.
+        """
+        x0, x1, y0, y1 = self.axis.get_extent()
+        x, y = numpy.meshgrid(numpy.linspace(x0, x1, samples), numpy.linspace(y0, y1, samples))
+        points = self.data_crs.transform_points(self.axis.projection, x.ravel(), y.ravel())
+        points = points[numpy.isfinite(points[:, :2]).all(axis=1)]
+        if not len(points):
+            return None
+        lons = numpy.sort((points[:, 0] + 180) % 360 - 180).tolist()
+        south, north = max(float(points[:, 1].min()), -90.), min(float(points[:, 1].max()), 90.)
+
+        # Over a pole every longitude is shown, up to the pole
+        for pole in (-90., 90.):
+            px, py = self.axis.projection.transform_point(0, pole, self.data_crs)
+            if x0 <= px <= x1 and y0 <= py <= y1:
+                return (-180., 180., min(south, pole), max(north, pole))
+
+        # The longitudes shown are everything but the widest gap between them
+        gaps = numpy.diff(lons + [lons[0] + 360])
+        widest = gaps.argmax()
+        if gaps[widest] < 2 * 360. / samples:
+            return (-180., 180., south, north)
+        if widest == len(lons) - 1:
+            return (lons[0], lons[-1], south, north)
+        return (lons[widest + 1], lons[widest] + 360, south, north)
 
+    def _coastline_resolution(self, extent=None, projection=None, dpi=DPI):
+        """Natural Earth scale of the coastlines for a map of `extent` at `dpi`, and the area in
+        data_crs they're clipped to. The axis has to be set up and zoomed to `extent` already.
+        """
+        bounds = self._coastline_bounds(extent, projection or ccrs.PlateCarree())
+        pixels = self.fig.get_size_inches()[0] * dpi * self.axis.get_position().width
+        degrees = bounds[1] - bounds[0] if bounds else 360.
+        return self.coastline_scale or coastline_scale(degrees / pixels), bounds
 
-    def _draw_pie_marker(self, language, features, colours, size=250):
-        """sections: (feattype, proportion)
+    def _draw_coastlines(self, extent, projection, dpi):
+        """Draw the Natural Earth coastlines at the scale that suits the map's resolution,
+        clipped to the area shown. Falls back to cartopy's 50m coastlines if the shapefile
+        isn't available.
         """
-        colourmaps = []
-        for f, c in zip(features, colours):
-            colourmaps.append(cm.get_cmap(c, self._plotdata[f]["range"]))
+        scale, bounds = self._coastline_resolution(extent, projection, dpi)
+        try:
+            path = coastline_path(scale)
+        except OSError: # Not downloaded, and no network
+            self.axis.coastlines(resolution='50m', color='black', linewidth=1)
+            return
+        pixels = self.fig.get_size_inches()[0] * dpi
+        parts = [bounds]
+        if bounds and bounds[1] > 180:
+            # Clip either side of the antimeridian, with the pixels shared between them
+            x0, x1, y0, y1 = bounds
+            parts = [(x0, 180., y0, y1), (-180., x1 - 360, y0, y1)]
+        geometries = []
+        for part in parts:
+            share = (part[1] - part[0]) / (bounds[1] - bounds[0]) if bounds else 1
+            geometries += self.shapefile_cache.geometries(path, self.data_crs, part, max(int(pixels * share), 1))
+        coastlines = cfeature.ShapelyFeature(
+            geometries,
+            self.data_crs,
+            edgecolor="black",
+            facecolor="none",
+            linewidth=1,
+        )
+        self.axis.add_feature(coastlines)
 
-        cumsum = numpy.cumsum([2 for f in features])
-        cumsum = cumsum / cumsum[-1]
-        pie = [0] + cumsum.tolist()
 
-        slices = []
-        for r1, r2, feat, cmap in zip(pie[:-1], pie[1:], features, colourmaps):
-            # Compute colour for this feature slice
-            norm = self._plotdata[feat]["norm"]
-            value = language[feat]
-            if self._plotdata[feat]["type"] == "discrete":
-                value = self._plotdata[feat]["groups"].get_group(value).index[0]
-            colour = cmap(norm(value))
+    def _slice_colours(self, feature, colour, rows=slice(None)):
+        """Resolve the face colour of `feature`'s slice for every language at once, or only
+        those at the positions `rows`.
+        """
+        plotdata = self._plotdata[feature]
+        return colour_lut(colour, plotdata.range)[plotdata.codes[rows]]
+
 
-            # Build the pie slice
-            angles = numpy.linspace(2 * numpy.pi * r1, 2 * numpy.pi * r2)
-            x = [0] + numpy.cos(angles).tolist()
-            y = [0] + numpy.sin(angles).tolist()
-            xy = numpy.column_stack([x, y])
-            marker = {"marker": xy, "facecolor": colour, "s": size, "alpha": 1,}
-            slices.append(marker)
+    def _draw_pie_markers(self, features, colours, size=MARKER_SIZE, rows=None):
+        """Draw a pie marker for every language, or only those at the positions `rows`.
+        Rather than one scatter call per slice per language, the slice geometry is computed
+        once and every slice of every language is drawn by a single collection. Each
+        language's position is repeated once per slice, and the collection cycles through
+        the slice paths, so the slices stack language by language as if drawn one at a time.
+        """
+        rows = slice(None) if rows is None else rows
+        longitudes = self.dataframe["longitude"].to_numpy()[rows]
+        latitudes = self.dataframe["latitude"].to_numpy()[rows]
+
+        paths, facecolours = [], []
+        for xy, feat, colour in zip(pie_marker(len(features)), features, colours):
+            slice_colours = self._slice_colours(feat, colour, rows)
+            marker = {"marker": xy, "facecolor": slice_colours, "s": size, "alpha": 1,}
 
             # Save the markers for clearing the map, drawing the legend, etc.
-            if self._plotdata[feat]["type"] == "discrete":
+            if self._plotdata[feat].type == "discrete":
                 self.discrete_markers.append(marker)
             else:
                 self.continuous_markers.append(marker)
 
-        # Draw the slices on the axis
-        for slyce in slices:
-            self.axis.scatter(
-                [language["longitude"]],
-                [language["latitude"]],
-                **slyce,
-                transform=self.projection,
-            )
+            # The path scatter would make of the slice
+            style = mmarkers.MarkerStyle(xy)
+            paths.append(style.get_path().transformed(style.get_transform()))
+            facecolours.append(slice_colours)
+
+        # Language by language, each slice in turn
+        facecolours = numpy.stack(facecolours, axis=1).reshape(-1, 4)
+        collection = self.axis.scatter(
+            numpy.repeat(longitudes, len(paths)), numpy.repeat(latitudes, len(paths)),
+            facecolor=facecolours, s=size, alpha=1, transform=self.data_crs,
+        )
+        collection.set_paths(paths)
+        self.artists.append(collection)
+        return
+
+
+    def _points_per_unit(self, x, y):
+        """Approximate scale of the map, in points per projection unit, given the projected
+        coordinates of the languages to fit if it has no extent.
+        """
+        if self.extent:
+            x0, x1, y0, y1 = self.extent
+        else:
+            x0, x1, y0, y1 = numpy.nanmin(x), numpy.nanmax(x), numpy.nanmin(y), numpy.nanmax(y)
+        box = self.axis.get_position()
+        width, height = self.fig.get_size_inches() * 72 * [box.width, box.height]
+        # The map keeps its aspect ratio, so the tighter of the two directions sets the scale
+        return min(width / max(x1 - x0, 1e-9), height / max(y1 - y0, 1e-9))
+
+
+    def _draw_aggregated_markers(self, features, colours, radius, size=MARKER_SIZE, rows=None):
+        """Draw pie markers, merging languages closer together on the map than about `radius`
+        points into one marker per cluster. Languages are clustered by which cell of a grid of
+        2 * `radius` point squares they fall in, so the number of markers is limited by the
+        area of the map rather than the number of languages.
+        An aggregated marker divides each discrete feature's slice between the feature's
+        colours in proportion to how many languages in the cluster have them, and colours a
+        continuous feature's slice by the cluster's mean value, see _cluster_shares. It grows
+        with the logarithm of the cluster's size, up to 4 times the area of a single marker.
+        """
+        rows = numpy.arange(len(self.dataframe)) if rows is None else numpy.asarray(rows)
+        lons = self.dataframe["longitude"].to_numpy(dtype=float)[rows]
+        lats = self.dataframe["latitude"].to_numpy(dtype=float)[rows]
+        valid = ~(numpy.isnan(lons) | numpy.isnan(lats))
+        rows, lons, lats = rows[valid], lons[valid], lats[valid]
+        if not len(rows):
+            return
 
+        # Cluster in map coordinates, so the grid is square on screen
+        xy = self.axis.projection.transform_points(self.data_crs, lons, lats)[:, :2]
+        cell = 2 * radius / self._points_per_unit(xy[:, 0], xy[:, 1])
+        labels, counts, _ = grid_clusters(xy, cell)
 
-    def _draw_pie_markers(self, features, colours):
-        for _, lang in self.dataframe.iterrows():
-            self._draw_pie_marker(lang, features, colours)
+        # Languages with nobody nearby keep their ordinary markers
+        single = counts[labels] == 1
+        self._draw_pie_markers(features, colours, size, rows[single])
+        if single.all():
+            return
+
+        # Renumber the remaining clusters from 0
+        clustered, labels = numpy.unique(labels[~single], return_inverse=True)
+        labels = labels.reshape(-1)
+        rows, lons, lats, counts = rows[~single], lons[~single], lats[~single], counts[clustered]
+        centres = numpy.column_stack([
+            numpy.bincount(labels, weights=lons) / counts,
+            numpy.bincount(labels, weights=lats) / counts,
+        ])
+        marker_sizes = size * numpy.minimum(1 + numpy.log2(counts), 4)
+
+        sector = 2 * numpy.pi / len(features)
+        paths, offsets, sizes, facecolours = [], [], [], []
+        for i, (feat, colour) in enumerate(zip(features, colours)):
+            plotdata = self._plotdata[feat]
+            lut = colour_lut(colour, plotdata.range)
+            for cluster, code, start, end in zip(*self._cluster_shares(plotdata, rows, labels, counts)):
+                wedge = pie_wedge(sector * (i + start), sector * (i + end))
+                paths.append(mpath.Path(numpy.vstack([wedge, wedge[:1]]), closed=True))
+                offsets.append(centres[cluster])
+                sizes.append(marker_sizes[cluster])
+                facecolours.append(lut[code])
+
+        # Scatter sets up the offsets and marker scaling, then each wedge gets its own path
+        offsets = numpy.array(offsets)
+        collection = self.axis.scatter(
+            offsets[:, 0], offsets[:, 1], s=sizes, facecolor=facecolours, alpha=1, transform=self.data_crs,
+        )
+        collection.set_paths(paths)
+        self.artists.append(collection)
         return
 
 
+    def _cluster_shares(self, plotdata, rows, labels, counts):
+        """Divide a feature's slice of each cluster's marker between its colours. Returns
+        (cluster, colour code, start, end) arrays of the wedges, with start and end as
+        fractions of the slice, missing values first. A discrete feature gets a wedge per
+        colour in the cluster in proportion to its languages. A continuous one gets a wedge of
+        the colour of the cluster's mean value, so there are at most two wedges per cluster
+        however many values there are.
+        `rows`, `labels` : the languages and which of the clusters of `counts` each is in
+        """
+        width = plotdata.range + 1
+        if plotdata.type == "discrete":
+            # Languages of each colour in each cluster, with missing values in column 0
+            keys, shares = numpy.unique(labels * width + plotdata.codes[rows] + 1, return_counts=True)
+        else:
+            values = plotdata.values[rows].astype(float)
+            present = ~numpy.isnan(values)
+            known = numpy.bincount(labels[present], minlength=len(counts))
+            total = numpy.bincount(labels[present], weights=values[present], minlength=len(counts))
+            # Quantised like continuous_feature
+            means = numpy.minimum(total / numpy.maximum(known, 1) * plotdata.range, plotdata.range - 1).astype(int)
+            clusters = numpy.arange(len(counts))
+            keys = numpy.concatenate([clusters * width, clusters * width + means + 1])
+            shares = numpy.concatenate([counts - known, known])
+            keys, shares = keys[shares > 0], shares[shares > 0]
+            order = numpy.argsort(keys, kind="stable")
+            keys, shares = keys[order], shares[order]
+
+        cluster, column = numpy.divmod(keys, width)
+        # Running total of the wedges before each one in its cluster
+        before = numpy.cumsum(shares) - shares
+        before -= before[numpy.searchsorted(cluster, cluster)]
+        return cluster, column - 1, before / counts[cluster], (before + shares) / counts[cluster]
+
+
+    def _compact_markers(self, collections, dpi=None):
+        """Regroup marker `collections` for smaller, faster vector output. Each slice shape
+        is still defined once per collection and placed per marker, but markers of the same
+        colour are drawn together, and only those touching the frame of the map are clipped
+        to it, as backends write out the clipping of every clipped marker separately.
+        With `dpi`, the markers are rasterized at that resolution instead, leaving the
+        basemap and isoglosses as vectors.
+        Run after the layout is final, as markers are placed in display coordinates.
+        """
+        if dpi:
+            for collection in collections:
+                collection.set_rasterized(True)
+            return
+
+        compacted = []
+        for collection in collections:
+            offsets = numpy.ma.getdata(collection.get_offsets()).astype(float)
+            paths = collection.get_paths()
+            sizes = collection.get_sizes()
+            facecolours = collection.get_facecolor()
+            centres = collection.get_offset_transform().transform(offsets)
+
+            # Half the width of the biggest marker of the collection, in display units
+            extent = max(numpy.abs(path.vertices).max() for path in paths)
+            radius = (extent * numpy.sqrt(numpy.broadcast_to(sizes, len(offsets))) + collection.get_linewidth().max() / 2) * self.fig.dpi / 72
+            frame = collection.get_clip_path().get_fully_transformed_path()
+            inside = numpy.ones(len(offsets), dtype=bool)
+            for dx, dy in [(-1, -1), (-1, 1), (1, -1), (1, 1)]:
+                inside &= frame.contains_points(centres + numpy.column_stack([dx * radius, dy * radius]))
+            drawn = numpy.isfinite(centres).all(axis=1)
+
+            colours, codes = numpy.unique(numpy.broadcast_to(facecolours, (len(offsets), 4)), axis=0, return_inverse=True)
+            codes = codes.reshape(-1)
+            # Markers cycling through a few paths, like pie slices, are grouped by path too
+            cycled = len(paths) < len(offsets)
+            shapes = numpy.arange(len(offsets)) % len(paths) if cycled else numpy.zeros(len(offsets), dtype=int)
+            for shape in range(len(paths) if cycled else 1):
+                for code, colour in enumerate(colours):
+                    for clipped in (False, True):
+                        rows = numpy.flatnonzero((shapes == shape) & (codes == code) & (inside != clipped) & drawn)
+                        if not len(rows):
+                            continue
+                        group = self.axis.scatter(
+                            offsets[rows, 0], offsets[rows, 1],
+                            s=sizes[rows] if len(sizes) > 1 else sizes, facecolor=colour, alpha=1,
+                            transform=self.data_crs, zorder=collection.get_zorder(),
+                        )
+                        group.set_paths([paths[shape]] if cycled else [paths[i] for i in rows])
+                        group.set_clip_on(clipped)
+                        compacted.append(group)
+            collection.remove()
+        self.artists = compacted + self.artists[len(collections):]
+
+
     def _draw_colourbars(self, features, colours):
-        colourmaps = [cm.get_cmap(c) for c in colours]
-        divider = make_axes_locatable(self.axis)
+        colourmaps = [plt.get_cmap(c) for c in colours]
+        divider = axes_grid1.make_axes_locatable(self.axis)
 
         # Need to make dummy mappables for the colourbars since we plotted the markers one by one
         for feat, cmap in zip(features, colourmaps):
-            if self._plotdata[feat]["type"] == "continuous":
-                mappable = cm.ScalarMappable(cmap=cmap, norm=self._plotdata[feat]["norm"])
+            plotdata = self._plotdata[feat]
+            if plotdata.type == "continuous":
+                norm = colors.Normalize(plotdata.vmin, plotdata.vmax)
+                mappable = cm.ScalarMappable(cmap=cmap, norm=norm)
                 ax_cb = divider.new_horizontal(size="5%", pad=0.5, axes_class=plt.Axes)
                 self.fig.add_axes(ax_cb)
-                bar = plt.colorbar(mappable, cax=ax_cb)
+                bar = self.fig.colorbar(mappable, cax=ax_cb)
                 bar.set_label(feat)
                 self.colourbars.append(bar)
         return
@@ -160,55 +533,671 @@ class FeatureMap:
         return
     
 
-    def _draw_isogloss(self, feature, colour, style, padding):
-        groupby = self._plotdata[feature]["groups"]
-        group_xy = zip(
-            [series.latitude for group, series in groupby],
-            [series.longitude for group, series in groupby],
-        )
-        group_points = [list(zip(lons, lats)) for lats, lons in group_xy]
-        for points in group_points:
-            filtered = [p for p in points if True not in numpy.isnan(p)]
-            print("points:", points, "filtered:", filtered)
-            if filtered:
-                isogloss = build_isogloss(filtered, padding=padding)
-                for point in isogloss:
-                    x, y = point
-                    self.axis.plot(x, y, "".join([colour, style]), transform=self.projection)
-                    
-    
-    def _draw_isoglosses(self, features, colour="k", style="-", padding=.1):
+    def _isogloss_groups(self, feature):
+        """Return the isogloss group code of every language, and the value of each group"""
+        plotdata = self._plotdata[feature]
+        if plotdata.type == "discrete":
+            return plotdata.codes, plotdata.categories
+        # Continuous features are grouped by exact value rather than by colour
+        codes, uniques = pandas.factorize(self.dataframe[feature], sort=True)
+        return codes, numpy.asarray(uniques)
+
+
+    def _view_bounds(self, margin=CULL_MARGIN):
+        """The map extent in data coordinates, widened by `margin` times its size on each
+        side, or None if everything has to be drawn.
+        """
+        if not self.extent or self.axis.projection != self.data_crs:
+            return None
+        x0, x1, y0, y1 = self.extent
+        dx, dy = (x1 - x0) * margin, (y1 - y0) * margin
+        return (x0 - dx, x1 + dx, y0 - dy, y1 + dy)
+
+
+    def _visible_rows(self, bounds):
+        """Positions of the languages inside `bounds`, or None for all of them"""
+        if bounds is None:
+            return None
+        if self._index is None:
+            self._index = PointIndex(numpy.column_stack([self.dataframe["longitude"], self.dataframe["latitude"]]))
+        return self._index.within(*bounds)
+
+
+    def _isogloss_outlines(self, features, padding=.1, bounds=None):
+        """Build an isogloss around each group of languages sharing a value of each feature.
+        The outlines of every group of every feature are built in one batch. If `bounds` is
+        given, groups whose outlines would lie entirely outside it are skipped.
+        Returns a list of each feature's outlines.
+        """
+        return [
+            [outline for _, outline in feature_outlines]
+            for feature_outlines in self._labelled_isogloss_outlines(features, padding, bounds)
+        ]
+
+
+    def _labelled_isogloss_outlines(self, features, padding=.1, bounds=None):
+        """Same as _isogloss_outlines, but each feature's outlines are (value, outline) pairs"""
+        coords = numpy.column_stack([self.dataframe["longitude"], self.dataframe["latitude"]])
+        segments, offsets, labels = [], [0], []
         for feature in features:
-            self._draw_isogloss(feature, colour, style, padding)
+            codes, values = self._isogloss_groups(feature)
+            n = len(values)
+            if bounds is not None:
+                x0, x1, y0, y1 = bounds
+                gx0, gx1, gy0, gy1 = (group_bounds(coords, codes, n) + [-padding, padding, -padding, padding]).T
+                visible = (gx0 <= x1) & (gx1 >= x0) & (gy0 <= y1) & (gy1 >= y0)
+                codes = numpy.where((codes >= 0) & visible[numpy.maximum(codes, 0)], codes, -1)
+            points, feature_offsets = group_segments(coords, codes, n)
+            segments.append(points)
+            offsets.extend(feature_offsets[1:] + offsets[-1])
+            labels.append(values)
+
+        outlines = build_isoglosses(
+            numpy.concatenate(segments), offsets, padding=padding, workers=self.workers,
+        )
+
+        result = []
+        start = 0
+        for values in labels:
+            outlines_of_feature = outlines[start:start + len(values)]
+            result.append([(v, o) for v, o in zip(values, outlines_of_feature) if o is not None])
+            start += len(values)
+        return result
+
+
+    def _draw_outlines(self, outlines, colour="k", style="-"):
+        """Draw lists of isogloss outlines, each list as a single collection"""
+        for feature_outlines in outlines:
+            contours = mcollections.LineCollection(
+                feature_outlines, colors=colour, linestyles=style, transform=self.data_crs,
+            )
+            self.axis.add_collection(contours)
+            self.contours.append(contours)
+            self.artists.append(contours)
+        self.axis.autoscale_view()
+        return
+
+
+    def _draw_isoglosses(self, features, colour="k", style="-", padding=.1, bounds=None):
+        """Draw an isogloss around each group of languages sharing a value of each feature,
+        as one collection per feature, leaving out those outside `bounds`.
+        """
+        self._draw_outlines(self._isogloss_outlines(features, padding, bounds), colour, style)
         return
 
     
-    def draw(self, filename, features, colours=[], isoglosses=[]):
-        # Clear the map
-        self.init_map(self.shapefile, self.extent, self.projection)
-        
-        # Check user input
+    def _check_input(self, features, colours, seed=None):
+        """Check the features to plot, returning the colourmaps to plot them with. Colourmaps
+        that aren't given are picked at random, the same way every time for the same `seed`.
+        """
         if not features:
             raise MattangError("Must specify at least one feature to plot!")
         
         for f in features:
             if f not in self.dataframe.columns:
                 raise MattangError("{} is not a valid feature".format(f))
+            try:
+                self._plotdata[f]
+            except TypeError as error:
+                # Some field types can have unhashable stuff that can't be grouped
+                raise MattangError("Can't plot feature {} due to error \"{}\"".format(f, error))
 
         if not colours:
             # Use randomly selected colourmaps
             allcolours = plt.colormaps()
-            colours = [random.choice(allcolours) for f in features]
+            chooser = random.Random(seed) if seed is not None else random
+            colours = [chooser.choice(allcolours) for f in features]
 
         if len(features) != len(colours):
             raise MattangError("Feature and colour list lengths must match")
+        return colours
+
+
+    def draw(self, filename, features, colours=[], isoglosses=[], dpi=None, size=None, preset=None, memory_budget=None, aggregate=False, seed=None, profile=None, compact=False, marker_dpi=None):
+        """Draw the map and save it to `filename`.
+        `dpi` : output resolution, DPI by default
+        `size` : figure (width, height) in inches
+        `preset` : name of an entry in PRESETS to take `dpi` and `size` from, e.g. "preview"
+        `memory_budget` : most bytes of raster to hold at once. PNG maps bigger than this are
+        rendered in horizontal strips and stitched together.
+        `aggregate` : merge the markers of languages within this many points of each other,
+        or within a marker's width if True, see _draw_aggregated_markers
+        `seed` : pick the same colourmaps for features without one every time
+        `profile` : file to save cProfile statistics of the render to
+        `compact` : write smaller, faster SVG and PDF files, see _compact_markers. Overlapping
+        markers of different colours may stack in a different order.
+        `marker_dpi` : rasterize the markers of SVG and PDF maps at this resolution
+        If render_cache is set and the same map has been drawn before, it's copied from the
+        cache instead of being drawn again.
+        Returns the RenderMetrics of the render, which are also passed to each of `hooks`.
+        """
+        metrics = RenderMetrics(filename, self.trace_memory)
+        profiler = cProfile.Profile() if profile else None
+        if profiler:
+            profiler.enable()
+        try:
+            self._draw(metrics, filename, features, colours, isoglosses, dpi, size, preset, memory_budget, aggregate, seed, compact, marker_dpi)
+        finally:
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(profile)
+        metrics.finish()
+        for hook in self.hooks:
+            hook(metrics)
+        return metrics
+
+
+    def _draw(self, metrics, filename, features, colours, isoglosses, dpi, size, preset, memory_budget, aggregate, seed, compact=False, marker_dpi=None):
+        if preset:
+            if preset not in PRESETS:
+                raise MattangError("Unknown preset {}, choose from {}".format(preset, ", ".join(PRESETS)))
+            dpi = dpi or PRESETS[preset].get("dpi")
+            size = size or PRESETS[preset].get("size")
+        dpi = dpi or DPI
+
+        # Check user input
+        with metrics.stage("check_input"):
+            colours = self._check_input(features, colours, seed)
+
+        key = None
+        if self.render_cache is not None:
+            with metrics.stage("cache"):
+                key = self._render_key(filename, features, colours, isoglosses, dpi, size, aggregate, compact, marker_dpi)
+                metrics.cached = self.render_cache.get(key, filename)
+            if metrics.cached:
+                return
+
+        # Clear the map
+        with metrics.stage("init_map"):
+            self.init_map(self.shapefile, self.extent, self.projection, size, dpi)
  
-        # Build and show the map
-        self._draw_pie_markers(features, colours)
+        # Build and show the map, leaving out whatever is outside the extent
+        with metrics.stage("markers"):
+            bounds = self._view_bounds()
+            rows = self._visible_rows(bounds)
+            if aggregate:
+                radius = numpy.sqrt(MARKER_SIZE) if aggregate is True else aggregate
+                self._draw_aggregated_markers(features, colours, radius, MARKER_SIZE, rows)
+            else:
+                self._draw_pie_markers(features, colours, MARKER_SIZE, rows)
+        metrics.rows = len(self.dataframe) if rows is None else len(rows)
+        metrics.markers = sum(len(collection.get_offsets()) for collection in self.artists)
+        markers = len(self.artists)
         if isoglosses:
-            self._draw_isoglosses(isoglosses)
+            with metrics.stage("isoglosses"):
+                self._draw_isoglosses(isoglosses, bounds=bounds)
         #self._draw_legend()
-        self._draw_colourbars(features, colours)
-        self.fig.set_dpi(DPI)
-        self.fig.tight_layout()
-        plt.savefig(filename)
+        with metrics.stage("colourbars"):
+            self._draw_colourbars(features, colours)
+        metrics.artists = len(self.artists) + len(self.colourbars)
+        fmt = os.path.splitext(str(filename))[1][1:].lower()
+        width, height = self.fig.get_size_inches() * dpi
+        incremental = self.incremental and fmt == "png" and (not memory_budget or width * height * 4 <= memory_budget)
+        with metrics.stage("tight_layout"):
+            self.fig.set_dpi(dpi)
+            self.fig.tight_layout()
+        vector = fmt in VECTOR_FORMATS
+        if vector and (compact or marker_dpi):
+            with metrics.stage("compact"):
+                self._compact_markers(self.artists[:markers], marker_dpi)
+            # Vector output is resolution independent, except for what's rasterized
+            dpi = marker_dpi or dpi
+        with metrics.stage("save"):
+            if incremental:
+                self._save_incremental(filename, dpi)
+            else:
+                self._save(filename, dpi, memory_budget, seed)
+        if not (self.reuse_figure or self.incremental):
+            self.close()
+        if key is not None:
+            with metrics.stage("cache"):
+                self.render_cache.put(key, filename)
+
+
+    def _render_key(self, filename, features, colours, isoglosses, dpi, size, aggregate, compact=False, marker_dpi=None):
+        """Hash of everything that goes into drawing a map, for render_cache"""
+        columns = ["longitude", "latitude"] + list(features) + list(isoglosses or [])
+        if self.shapefile:
+            stat = os.stat(self.shapefile)
+            basemap = (os.path.abspath(self.shapefile), stat.st_mtime_ns, stat.st_size)
+        else:
+            basemap = ("coastlines", self.coastline_scale)
+        return inputs_hash(
+            self.dataframe, dict.fromkeys(columns),
+            CACHE_VERSION, list(features), list(colours), list(isoglosses or []),
+            tuple(self.extent) if self.extent else None, self.projection.proj4_init if self.projection else None, basemap,
+            dpi, tuple(size) if size else None, aggregate, compact, marker_dpi,
+            os.path.splitext(str(filename))[1].lower(),
+        )
+
+
+    def _save(self, filename, dpi, memory_budget=None, seed=None):
+        width, height = self.fig.get_size_inches() * dpi
+        fmt = os.path.splitext(str(filename))[1][1:].lower()
+        if not memory_budget or width * height * 4 <= memory_budget or fmt in VECTOR_FORMATS:
+            if seed is None:
+                self.fig.savefig(filename, dpi=dpi)
+                return
+            # Leave out the date and random element IDs, so vector output is reproducible too
+            metadata = {"CreationDate": None} if fmt == "pdf" else {"Date": None} if fmt in ["svg", "svgz"] else None
+            with plt.rc_context({"svg.hashsalt": str(seed)}):
+                self.fig.savefig(filename, dpi=dpi, metadata=metadata)
+        elif fmt == "png":
+            save_in_strips(self.fig, filename, dpi, memory_budget)
+        else:
+            raise MattangError("Maps bigger than the memory budget can only be saved as PNG")
+
+
+    def _layout(self, renderer):
+        """Place every axis as drawing the figure would, returning the subplot parameters and
+        the map's view limits and position, which the basemap raster depends on
+        """
+        xlim, ylim = self.axis.get_xlim(), self.axis.get_ylim() # Autoscales, if it's pending
+        for axis in self.fig.axes:
+            locator = axis.get_axes_locator()
+            axis.apply_aspect(locator(axis, renderer) if locator else None)
+        params = self.fig.subplotpars
+        subplots = [getattr(params, name) for name in ["left", "right", "bottom", "top", "wspace", "hspace"]]
+        # Rounded well below a pixel, as the same layout comes out slightly different in new figures
+        return tuple(
+            tuple(round(float(value), 9) for value in values)
+            for values in (subplots, xlim, ylim, self.axis.get_position().bounds)
+        )
+
+
+    def _save_incremental(self, filename, dpi):
+        """Save the figure as PNG, drawing the basemap only if it isn't kept from an earlier
+        draw. Otherwise the kept raster of everything but the markers, isoglosses and colourbars
+        is restored, and just those are drawn over it, so the time taken depends on them rather
+        than on the basemap. The markers end up over the coastlines rather than under them.
+        Rasters are kept for the max_backgrounds most recent maps (basemap, extent, size and
+        dpi) and layouts, which the colourbars change, until close is called.
+        """
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        canvas = self.fig.canvas if isinstance(self.fig.canvas, FigureCanvasAgg) else FigureCanvasAgg(self.fig)
+        renderer = canvas.get_renderer()
+        key = (self._basemap_key, self.coastline_scale, self._layout(renderer))
+        layers = self.artists + [bar.ax for bar in self.colourbars]
+        if key in self._backgrounds:
+            self._backgrounds.move_to_end(key)
+            canvas.restore_region(self._backgrounds[key])
+        else:
+            for artist in layers:
+                artist.set_visible(False)
+            canvas.draw()
+            for artist in layers:
+                artist.set_visible(True)
+            self._backgrounds[key] = canvas.copy_from_bbox(self.fig.bbox)
+            while len(self._backgrounds) > self.max_backgrounds:
+                self._backgrounds.popitem(last=False)
+
+        for artist in sorted(self.artists, key=lambda artist: artist.get_zorder()):
+            artist.draw(renderer)
+        # Keep the map frame over markers on its edge
+        for spine in self.axis.spines.values():
+            spine.draw(renderer)
+        for bar in self.colourbars:
+            bar.ax.draw(renderer)
+
+        image = numpy.asarray(renderer.buffer_rgba())
+        write_png(filename, image.shape[1], image.shape[0], [image], dpi)
+
+
+    def draw_panels(self, filename, panels, colours=[], isoglosses=[], ncols=None, dpi=None, size=None, preset=None, aggregate=False, seed=None):
+        """Draw small multiples: a grid of maps of the same area in one figure, saved to
+        `filename`, to compare features side by side.
+        `panels` : a feature or list of features to draw on each map
+        `colours` : a colourmap or list of colourmaps for each panel, as for draw. Features
+        of panels without one get a random colourmap, the same in every panel they're in.
+        `isoglosses` : features to draw isoglosses around on every panel
+        `ncols` : panels per row, enough to make the grid about square if not given
+        `size` : figure (width, height) in inches, 4 by 3 per panel if not given
+        The basemap geometry, colour lookup tables, culled languages and isogloss outlines
+        are computed once and shared by all the panels. The figure is closed afterwards.
+        Other arguments are as for draw. Returns the RenderMetrics of the render.
+        """
+        metrics = RenderMetrics(filename, self.trace_memory)
+        if preset:
+            if preset not in PRESETS:
+                raise MattangError("Unknown preset {}, choose from {}".format(preset, ", ".join(PRESETS)))
+            dpi = dpi or PRESETS[preset].get("dpi")
+            size = size or PRESETS[preset].get("size")
+        dpi = dpi or DPI
+
+        with metrics.stage("check_input"):
+            panels = [[panel] if isinstance(panel, str) else list(panel) for panel in panels]
+            if not panels:
+                raise MattangError("Must specify at least one panel to plot!")
+            features = list(dict.fromkeys(feature for panel in panels for feature in panel))
+            defaults = dict(zip(features, self._check_input(features, [], seed)))
+            panel_colours = []
+            for i, panel in enumerate(panels):
+                given = colours[i] if i < len(colours) and colours[i] else [defaults[f] for f in panel]
+                given = [given] if isinstance(given, str) else list(given)
+                panel_colours.append(self._check_input(panel, given))
+
+        with metrics.stage("init_map"):
+            self.close()
+            ncols = ncols or int(numpy.ceil(numpy.sqrt(len(panels))))
+            nrows = int(numpy.ceil(len(panels) / ncols))
+            projection = self.projection or ccrs.PlateCarree()
+            self.fig, axes = plt.subplots(
+                nrows, ncols, figsize=size or (4 * ncols, 3 * nrows), squeeze=False,
+                subplot_kw=dict(projection=projection),
+            )
+            axes = axes.ravel()
+            for axis in axes[len(panels):]:
+                self.fig.delaxes(axis)
+            for axis in axes[:len(panels)]:
+                self.axis = axis
+                self._draw_basemap(self.shapefile, self.extent, projection, dpi)
+
+        with metrics.stage("markers"):
+            bounds = self._view_bounds()
+            rows = self._visible_rows(bounds)
+            for axis, panel, panel_colour in zip(axes, panels, panel_colours):
+                self.axis = axis
+                if aggregate:
+                    radius = numpy.sqrt(MARKER_SIZE) if aggregate is True else aggregate
+                    self._draw_aggregated_markers(panel, panel_colour, radius, MARKER_SIZE, rows)
+                else:
+                    self._draw_pie_markers(panel, panel_colour, MARKER_SIZE, rows)
+                axis.set_title(", ".join(panel))
+        metrics.rows = len(self.dataframe) if rows is None else len(rows)
+        metrics.markers = sum(len(collection.get_offsets()) for collection in self.artists)
+        if isoglosses:
+            with metrics.stage("isoglosses"):
+                outlines = self._isogloss_outlines(isoglosses, bounds=bounds)
+                for axis in axes[:len(panels)]:
+                    self.axis = axis
+                    self._draw_outlines(outlines)
+        with metrics.stage("colourbars"):
+            for axis, panel, panel_colour in zip(axes, panels, panel_colours):
+                self.axis = axis
+                self._draw_colourbars(panel, panel_colour)
+        metrics.artists = len(self.artists) + len(self.colourbars)
+        with metrics.stage("tight_layout"):
+            self.fig.set_dpi(dpi)
+            self.fig.tight_layout()
+        with metrics.stage("save"):
+            self._save(filename, dpi, seed=seed)
+        self.close()
+
+        metrics.finish()
+        for hook in self.hooks:
+            hook(metrics)
+        return metrics
+
+
+    def export(self, filename, features, colours=[], isoglosses=[], seed=None, padding=.1):
+        """Write the data of a map to `filename` instead of drawing it, for consumers that draw
+        maps themselves. The format is picked from the extension, see export.EXPORT_FORMATS.
+        Each language is a point with its name, if there's a name column, and the value and
+        resolved slice colour ("<feature>_colour") of each of `features`, in slice order.
+        Each isogloss is a polygon with the feature it's drawn for ("isogloss") and the value
+        it groups ("value"). Features have a "kind" of "language" or "isogloss".
+        Features are streamed to the file as they're built, without drawing a figure. Only what
+        lies inside the extent, if it's set, is exported. Coordinates are in data_crs.
+        Returns the number of features written.
+        """
+        fmt = export_format(filename)
+        if fmt is None:
+            raise MattangError("Can't export {}, use one of {}".format(filename, ", ".join(EXPORT_FORMATS)))
+        colours = self._check_input(features, colours, seed)
+        isoglosses = list(isoglosses or [])
+
+        bounds = None
+        if self.extent and (self.projection is None or self.projection == self.data_crs):
+            bounds = tuple(self.extent)
+        rows = self._visible_rows(bounds)
+        rows = numpy.arange(len(self.dataframe)) if rows is None else rows
+
+        records = itertools.chain(
+            self._language_records(features, colours, rows),
+            self._isogloss_records(isoglosses, padding, bounds),
+        )
+        if fmt == "geojson":
+            return write_geojson(filename, records)
+        if fmt == "geojsonseq":
+            return write_geojson_seq(filename, records)
+        if fmt == "geojsonl":
+            return write_geojson_seq(filename, records, separator="")
+
+        schema = {"kind": "str"}
+        if "name" in self.dataframe.columns:
+            schema["name"] = "str"
+        for feature in features:
+            schema[feature] = "float" if self._plotdata[feature].type == "continuous" else "str"
+            schema[feature + "_colour"] = "str"
+        if isoglosses:
+            schema.update(isogloss="str", value="str")
+        try:
+            return write_flatgeobuf(filename, records, schema)
+        except ImportError as error:
+            raise MattangError("Can't export {} files without {}".format(fmt, error.name or error))
+
+
+    def _language_records(self, features, colours, rows):
+        """GeoJSON point features of the located languages at the positions `rows`"""
+        lons = self.dataframe["longitude"].to_numpy(dtype=float)[rows]
+        lats = self.dataframe["latitude"].to_numpy(dtype=float)[rows]
+        located = ~(numpy.isnan(lons) | numpy.isnan(lats))
+        rows, lons, lats = rows[located], numpy.round(lons[located], 6).tolist(), numpy.round(lats[located], 6).tolist()
+
+        columns = [("name", _json_values(self.dataframe["name"].to_numpy()[rows]))] if "name" in self.dataframe.columns else []
+        for feature, colour in zip(features, colours):
+            plotdata = self._plotdata[feature]
+            lut = numpy.array(hex_colours(colour_lut(colour, plotdata.range)), dtype=object)
+            columns.append((feature, _json_values(self.dataframe[feature].to_numpy()[rows])))
+            columns.append((feature + "_colour", lut[plotdata.codes[rows]].tolist()))
+
+        for i, (lon, lat) in enumerate(zip(lons, lats)):
+            properties = {"kind": "language"}
+            for name, values in columns:
+                properties[name] = values[i]
+            yield {"type": "Feature", "geometry": {"type": "Point", "coordinates": [lon, lat]}, "properties": properties}
+
+
+    def _isogloss_records(self, isoglosses, padding=.1, bounds=None):
+        """GeoJSON polygon features of the isoglosses of `isoglosses`, leaving out those
+        outside `bounds`
+        """
+        if not isoglosses:
+            return
+        for feature, outlines in zip(isoglosses, self._labelled_isogloss_outlines(isoglosses, padding, bounds)):
+            values = _json_values(numpy.array([value for value, _ in outlines], dtype=object))
+            for value, (_, outline) in zip(values, outlines):
+                yield {
+                    "type": "Feature",
+                    "geometry": {"type": "Polygon", "coordinates": [numpy.round(outline, 6).tolist()]},
+                    "properties": {"kind": "isogloss", "isogloss": feature, "value": value},
+                }
+
+
+    def draw_many(self, jobs, workers=None):
+        """Render many maps of the loaded data, in parallel if `workers` > 1.
+        `jobs` : sequence of (filename, features, colours, isoglosses, options) tuples, the
+        arguments to draw. options is a dict of draw's keyword arguments like dpi. colours,
+        isoglosses and options can be left out.
+        The plotting metadata of every feature used is computed once up front, and each worker
+        process receives this FeatureMap once when it starts rather than once per job.
+        Returns a RenderResult per job, in order. A failed job records its error without
+        stopping the rest of the batch.
+        """
+        jobs = [tuple(job) for job in jobs]
+        for job in jobs:
+            for feature in list(job[1] or []) + list(job[3] if len(job) > 3 and job[3] else []):
+                try:
+                    self._plotdata[feature]
+                except (KeyError, TypeError):
+                    pass # Reported by the job itself
+
+        results = self._run_jobs(_render_job, jobs, workers)
+        if workers and workers > 1:
+            # The copies of this FeatureMap in the workers don't have the hooks
+            for result in results:
+                for hook in self.hooks if result.metrics else []:
+                    hook(result.metrics)
+        return results
+
+
+    def draw_tiles(self, directory, features, colours=[], isoglosses=[], zooms=range(0, 7), workers=None, tile_size=256, size=MARKER_SIZE, seed=None):
+        """Render the map as a pyramid of z/x/y.png slippy map tiles in `directory`. The tiles
+        are transparent, to be laid over a web basemap, and are drawn in parallel if `workers`
+        is more than 1.
+        `zooms` : zoom levels to render
+        `size` : marker size in square pixels, as for scatter
+        `seed` : pick the same colourmaps for features without one every time
+        Tiles without markers or isoglosses on them are skipped, as are zoom levels whose
+        inputs haven't changed since they were last rendered into `directory`.
+        Returns a dict mapping each zoom level to the RenderResults of its tiles, which is
+        empty for zoom levels that were up to date.
+        """
+        colours = self._check_input(features, colours, seed)
+        outlines = [o for feature in self._isogloss_outlines(isoglosses) for o in feature] if isoglosses else []
+        columns = ["longitude", "latitude"] + list(features) + list(isoglosses)
+        digest = inputs_hash(self.dataframe, columns, list(features), list(colours), list(isoglosses), tile_size, size)
+
+        lons = self.dataframe["longitude"].to_numpy(dtype=float)
+        lats = self.dataframe["latitude"].to_numpy(dtype=float)
+        # Tiles are drawn at 72 DPI, so a marker's radius in pixels is sqrt(size) / 2
+        margin = (numpy.sqrt(size) / 2 + 1) / tile_size
+
+        jobs, results, todo = [], {}, []
+        for z in zooms:
+            zoom_dir = os.path.join(directory, str(z))
+            manifest = os.path.join(zoom_dir, TILE_INPUTS_FILE)
+            results[z] = []
+            if os.path.exists(manifest):
+                with open(manifest) as f:
+                    if f.read() == digest:
+                        continue
+            # Clear out the old tiles, some of them might be empty now
+            shutil.rmtree(zoom_dir, ignore_errors=True)
+            todo.append(z)
+
+            markers = point_tiles(lons, lats, z, margin)
+            contours = {}
+            for i, outline in enumerate(outlines):
+                for tile in line_tiles(outline, z, 1 / tile_size):
+                    contours.setdefault(tile, []).append(i)
+            for x, y in sorted(set(markers) | set(contours)):
+                jobs.append((zoom_dir, z, x, y, markers.get((x, y)), contours.get((x, y), [])))
+
+        shared = (features, colours, outlines, tile_size, size)
+        for job, result in zip(jobs, self._run_jobs(_render_tile, jobs, workers, shared)):
+            results[job[1]].append(result)
+
+        for z in todo:
+            if all(result.error is None for result in results[z]):
+                os.makedirs(os.path.join(directory, str(z)), exist_ok=True)
+                with open(os.path.join(directory, str(z), TILE_INPUTS_FILE), "w") as f:
+                    f.write(digest)
+        return results
+
+
+    def _draw_tile(self, filename, bounds, features, colours, rows, outlines, tile_size=256, size=MARKER_SIZE):
+        """Draw a single transparent tile of the Web Mercator extent `bounds`, with the
+        markers of the languages at positions `rows` and the given isogloss outlines.
+        """
+        self.close()
+        projection = ccrs.Mercator.GOOGLE
+        self.fig = plt.figure(figsize=(tile_size / 72, tile_size / 72), dpi=72)
+        self.axis = self.fig.add_axes([0, 0, 1, 1], projection=projection)
+        self.axis.set_extent(bounds, crs=projection)
+        self.axis.set_axis_off()
+        if rows is not None:
+            self._draw_pie_markers(features, colours, size, rows)
+        if outlines:
+            self._draw_outlines([outlines])
+        self.fig.savefig(filename, dpi=72, transparent=True)
+        self.close()
+
+
+    def _run_jobs(self, func, jobs, workers=None, shared=None):
+        """Run `func` over `jobs` with this FeatureMap and `shared` set up in each worker"""
+        if not workers or workers < 2:
+            _init_worker(self, shared)
+            return [func(job) for job in jobs]
+
+        chunksize = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self, shared)) as executor:
+            return list(executor.map(func, jobs, chunksize=chunksize))
+
+
+    def __getstate__(self):
+        # Figures don't need to travel to worker processes, every draw makes its own. Nor does
+        # the parent's basemap cache, workers use their own shapefile_cache
+        state = self.__dict__.copy()
+        for attr in ["fig", "axis", "_basemap_key", "_backgrounds", "shapefile_cache", "hooks", "discrete_markers", "continuous_markers", "colourbars", "contours", "artists"]:
+            state.pop(attr, None)
+        return state
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.fig = None
+        self.axis = None
+        self._basemap_key = None
+        self._backgrounds = OrderedDict()
+        self.shapefile_cache = shapefile_cache
+        self.hooks = []
+        self._reset_layers()
+
+
+# The FeatureMap that draw_many and draw_tiles jobs are rendered with in this process, and
+# any other data shared by all of the jobs
+_worker_map = None
+_worker_shared = None
+
+
+def _init_worker(featuremap, shared=None):
+    global _worker_map, _worker_shared
+    _worker_map = featuremap
+    _worker_shared = shared
+
+
+def _json_values(values):
+    """`values` as a list of JSON serialisable Python objects, with None for missing values"""
+    missing = pandas.isna(values)
+    values = values.tolist()
+    if values and any(isinstance(v, numpy.generic) for v in values):
+        # Object arrays can hold numpy scalars, which json can't always serialise
+        values = [v.item() if isinstance(v, numpy.generic) else v for v in values]
+    for i in numpy.flatnonzero(missing):
+        values[i] = None
+    return values
+
+
+def _render_job(job):
+    filename, features, colours, isoglosses, options = (job + (None,) * 3)[:5]
+    start = time.perf_counter()
+    error = metrics = None
+    try:
+        if export_format(filename):
+            _worker_map.export(filename, features, colours or [], isoglosses or [], seed=(options or {}).get("seed"))
+        else:
+            metrics = _worker_map.draw(filename, features, colours or [], isoglosses or [], **(options or {}))
+    except Exception as e:
+        error = "{}: {}".format(type(e).__name__, e)
+        _worker_map.close()
+    return RenderResult(filename, time.perf_counter() - start, error, metrics)
+
+
+def _render_tile(job):
+    directory, z, x, y, rows, contours = job
+    features, colours, outlines, tile_size, size = _worker_shared
+    filename = os.path.join(directory, str(x), "{}.png".format(y))
+    start = time.perf_counter()
+    error = None
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        _worker_map._draw_tile(
+            filename, tile_bounds(z, x, y), features, colours,
+            rows, [outlines[i] for i in contours], tile_size, size,
+        )
+    except Exception as e:
+        error = "{}: {}".format(type(e).__name__, e)
+        _worker_map.close()
+    return RenderResult(filename, time.perf_counter() - start, error, None)
@@ -1,8 +1,19 @@
 from random import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING
+
+import numpy
 
-from scipy.spatial import ConvexHull
 from numpy import cos, sin, pi, cumsum, linspace, column_stack
 
+from .lazy import LazyModule
+
+# Only needed once isoglosses are drawn or a map is culled
+spatial = LazyModule("scipy.spatial")
+
+if TYPE_CHECKING:
+    from scipy.spatial import ConvexHull
+
 
 def chunk(seq, overlap):
     """Divide a sequence into a list of overlapping subsequences"""
@@ -21,10 +32,11 @@ def is_colinear(points):
     Building a convex hull only works if points are not colinear"""
     if len(points) < 3:
         raise ValueError("Can't compute colinearity of less than three points!")
-    colinear = lambda a, b, c: (
-        (b[1] - a[1]) * (c[0] - a[0]) == (b[0] - a[0]) * (c[1] - a[1])
-    )
-    return all([colinear(a, b, c) for a, b, c in chunk(points, 3)])
+    points = numpy.asarray(points, dtype=float)
+    a, b, c = points[:-2], points[1:-1], points[2:]
+    return bool(numpy.all(
+        (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0]) == (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1])
+    ))
 
 
 def midpoint(point_a, point_b, offset=(0, 0)):
@@ -46,7 +58,7 @@ def points_circumference(point, radius, n=10):
     return result
 
 
-def buffer_convex_hull(hull: ConvexHull, stretch: float, n: int) -> ConvexHull:
+def buffer_convex_hull(hull: "ConvexHull", stretch: float, n: int) -> "ConvexHull":
     """Expand the boundaries of a convex hull `hull` and round the borders.
     `stretch` : how far from the original hull vertices to place points
     `n` : how many vertices on the new hull to generate. This controls the
@@ -61,34 +73,143 @@ def buffer_convex_hull(hull: ConvexHull, stretch: float, n: int) -> ConvexHull:
     ):
         new_points.extend(points_circumference(point, stretch, n))
 
-    return ConvexHull(new_points)
+    return spatial.ConvexHull(new_points)
+
+
+def buffer_hull(vertices, padding, resolution=16):
+    """Expand the convex polygon `vertices` by `padding` and round the corners.
+    `vertices` : (n, 2) array of polygon vertices in counterclockwise order, as given by
+    ConvexHull. One vertex gives a circle, two give a stadium shape.
+    `resolution` : how many points to place on the arc around each corner.
+    Returns the closed outline as an (n * resolution + 1, 2) array. Unlike buffer_convex_hull
+    this computes the offset polygon directly, so the same input always gives the same outline.
+    """
+    vertices = numpy.asarray(vertices, dtype=float)
+
+    # Each corner is rounded by an arc turning from the outward normal of the edge coming into
+    # the vertex to the outward normal of the edge leaving it. The outward normal of a
+    # counterclockwise edge (dx, dy) is (dy, -dx)
+    edges = numpy.roll(vertices, -1, axis=0) - vertices
+    normal_out = numpy.arctan2(-edges[:, 0], edges[:, 1])
+    normal_in = numpy.roll(normal_out, 1)
+    turn = (normal_out - normal_in) % (2 * pi)
+    if len(vertices) == 1:
+        turn[:] = 2 * pi
+
+    angles = normal_in[:, None] + turn[:, None] * linspace(0, 1, resolution)[None, :]
+    arcs = vertices[:, None, :] + padding * numpy.stack([cos(angles), sin(angles)], axis=-1)
+    outline = arcs.reshape(-1, 2)
+    return numpy.vstack([outline, outline[:1]])
+
+
+def hull_vertices(points):
+    """Vertices of the convex hull of `points` in counterclockwise order. If the points are
+    all the same or colinear, the hull is just the point or the two ends of the line.
+    """
+    points = numpy.unique(numpy.asarray(points, dtype=float), axis=0)
+    if len(points) < 3 or is_colinear(points):
+        # Sorted lexicographically, so the first and last colinear points are the line's ends
+        return points[[0, -1]] if len(points) > 1 else points
+    hull = spatial.ConvexHull(points)
+    return points[hull.vertices]
 
 
-def build_isogloss(points, padding=.1, roundedness=100, scale=.001):
-    if not points:
+def build_isogloss(points, padding=.1, roundedness=16):
+    """Build the outline of an isogloss around `points`, as a closed (n, 2) array.
+    `padding` : how far outside the points to draw the outline
+    `roundedness` : how many points to place on each rounded corner
+    """
+    if len(points) == 0:
         raise ValueError("Input point sequence empty")
+    return buffer_hull(hull_vertices(points), padding, roundedness)
 
-    # Check that we have at least 3 points
-    pdiff = 3 - len(points)
-    if pdiff > 0:
-        points.extend(points_circumference(points[0], scale, pdiff))
 
-    # Make sure that points are not colinear
-    if is_colinear(points):
-        points.extend(points_circumference(points[0], scale, 1))
+def group_segments(points, codes, ngroups):
+    """Sort `points` into one contiguous segment per group, for build_isoglosses.
+    `codes` : group of each point, from 0 to `ngroups` - 1. Points with a negative code or a
+    NaN coordinate are dropped.
+    Returns (points, offsets), where group i is points[offsets[i]:offsets[i + 1]].
+    """
+    points = numpy.asarray(points, dtype=float)
+    codes = numpy.asarray(codes)
+    keep = (codes >= 0) & ~numpy.isnan(points).any(axis=1)
+    points, codes = points[keep], codes[keep]
+    order = numpy.argsort(codes, kind="stable")
+    offsets = numpy.concatenate([[0], numpy.cumsum(numpy.bincount(codes, minlength=ngroups))])
+    return points[order], offsets
 
-    # Now we can build the hull
-    hull = ConvexHull(points)
-    
-    # After computing the complex hull, we expand it and round the edges
-    buff_hull = buffer_convex_hull(hull, padding, roundedness)
 
-    isogloss = []
-    for simplex in buff_hull.simplices:
-        point = (buff_hull.points[simplex, 0], buff_hull.points[simplex, 1])
-        isogloss.append(point)
-    
-    return isogloss
+def group_bounds(points, codes, ngroups):
+    """Bounding box (x0, x1, y0, y1) of each group of `points`, as rows of an (ngroups, 4)
+    array. Points with a negative code or a NaN coordinate are left out, and empty groups get
+    an inverted box that intersects nothing.
+    """
+    points = numpy.asarray(points, dtype=float)
+    codes = numpy.asarray(codes)
+    keep = (codes >= 0) & ~numpy.isnan(points).any(axis=1)
+    points, codes = points[keep], codes[keep]
+    bounds = numpy.tile([numpy.inf, -numpy.inf, numpy.inf, -numpy.inf], (ngroups, 1))
+    numpy.minimum.at(bounds[:, 0], codes, points[:, 0])
+    numpy.maximum.at(bounds[:, 1], codes, points[:, 0])
+    numpy.minimum.at(bounds[:, 2], codes, points[:, 1])
+    numpy.maximum.at(bounds[:, 3], codes, points[:, 1])
+    return bounds
+
+
+class PointIndex:
+    """KD-tree over (n, 2) `points`, some of which may be NaN, for finding the points in a box"""
+    def __init__(self, points):
+        points = numpy.asarray(points, dtype=float)
+        self.rows = numpy.flatnonzero(~numpy.isnan(points).any(axis=1))
+        self.points = points[self.rows]
+        self.tree = spatial.cKDTree(self.points) if len(self.rows) else None
+
+    def within(self, x0, x1, y0, y1):
+        """Sorted positions in the original points of those inside the box"""
+        if self.tree is None:
+            return numpy.array([], dtype=int)
+        # Search the square around the box's centre, then trim it to the box
+        centre = ((x0 + x1) / 2, (y0 + y1) / 2)
+        radius = max(x1 - x0, y1 - y0) / 2
+        candidates = numpy.asarray(self.tree.query_ball_point(centre, radius, p=numpy.inf), dtype=int)
+        x, y = self.points[candidates].T
+        inside = candidates[(x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)]
+        return numpy.sort(self.rows[inside])
+
+
+def _build_segments(points, offsets, padding, roundedness):
+    return [
+        build_isogloss(points[start:end], padding, roundedness) if end > start else None
+        for start, end in zip(offsets[:-1], offsets[1:])
+    ]
+
+
+def build_isoglosses(points, offsets, padding=.1, roundedness=16, workers=None):
+    """Build the isogloss outlines of many groups of points at once.
+    `points`, `offsets` : segmented (n, 2) coordinate array, where group i is
+    points[offsets[i]:offsets[i + 1]], as given by group_segments. Segments of several features
+    can be concatenated to build them all in one batch.
+    `workers` : if more than one, split the groups between this many processes
+    Returns a list with the closed outline of each group, or None for empty groups.
+    """
+    points = numpy.asarray(points, dtype=float)
+    offsets = numpy.asarray(offsets)
+    ngroups = len(offsets) - 1
+    if not workers or workers < 2 or ngroups < 2:
+        return _build_segments(points, offsets, padding, roundedness)
+
+    # Give each worker a contiguous run of groups with roughly the same number of points, so
+    # only that run's slice of the coordinates has to be sent to it
+    bounds = numpy.searchsorted(offsets, numpy.linspace(0, offsets[-1], workers + 1))
+    bounds = numpy.unique(numpy.clip(bounds, 0, ngroups))
+    bounds[0], bounds[-1] = 0, ngroups
+    chunks = [
+        (points[offsets[a]:offsets[b]], offsets[a:b + 1] - offsets[a], padding, roundedness)
+        for a, b in zip(bounds[:-1], bounds[1:])
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_build_segments, *zip(*chunks))
+        return [outline for result in results for outline in result]
 
 
 def pie_marker(n_slices):
@@ -106,3 +227,30 @@ def pie_marker(n_slices):
         xy = column_stack([x, y])
         slices.append(xy)
     return slices
+
+
+def pie_wedge(theta1, theta2, radius=.5):
+    """Vertices of the pie slice between angles `theta1` and `theta2`, in radians, of a circle
+    of `radius` around the origin, with points on the arc every 7 degrees or so.
+    """
+    n = max(2, int(numpy.ceil((theta2 - theta1) / (2 * pi) * 50)) + 1)
+    angles = linspace(theta1, theta2, n)
+    x = [0] + (radius * cos(angles)).tolist()
+    y = [0] + (radius * sin(angles)).tolist()
+    return column_stack([x, y])
+
+
+def grid_clusters(points, cell):
+    """Cluster (n, 2) `points` by the square grid cell of side `cell` they fall into.
+    Returns (labels, counts, centres): the cluster of each point, the number of points in
+    each cluster and the mean position of each cluster's points.
+    """
+    points = numpy.asarray(points, dtype=float)
+    cells = numpy.floor((points - points.min(axis=0)) / cell).astype(numpy.int64)
+    _, labels, counts = numpy.unique(cells, axis=0, return_inverse=True, return_counts=True)
+    labels = labels.reshape(-1)
+    centres = column_stack([
+        numpy.bincount(labels, weights=points[:, 0]) / counts,
+        numpy.bincount(labels, weights=points[:, 1]) / counts,
+    ])
+    return labels, counts, centres
@@ -0,0 +1,19 @@
+import importlib
+
+
+class LazyModule:
+    """Stand-in for the module `name` that only imports it when one of its attributes is
+    first used, so that importing mattang doesn't pay for matplotlib and cartopy until a
+    map is actually drawn.
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return "<lazy module {}>".format(self._name)
@@ -0,0 +1,93 @@
+"""
+Measurements of where the time and memory of a render goes, see FeatureMap.draw
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+
+def peak_rss():
+    """Peak resident set size of this process so far in bytes, or None if it's unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes everywhere but macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RenderMetrics:
+    """Timings and counters of one render.
+    `stages` : seconds spent in each stage of the render, in the order they ran
+    `peak_rss` : the process's peak resident memory after each stage, in bytes. It only
+    ever goes up, so the stage where it grows is the one that set a new peak.
+    `peak_traced` : most memory allocated through Python at once during each stage, in bytes,
+    if memory tracing was on. Tracing makes rendering several times slower.
+    `rows` : languages drawn, after culling
+    `artists` : collections added to the map
+    `markers` : pie slices drawn, across all collections
+    `cached` : whether the map was copied from the render cache
+    """
+    def __init__(self, filename, trace_memory=False):
+        self.filename = str(filename)
+        self.trace_memory = trace_memory
+        self.stages = OrderedDict()
+        self.peak_rss = OrderedDict()
+        self.peak_traced = OrderedDict() if trace_memory else None
+        self.rows = 0
+        self.artists = 0
+        self.markers = 0
+        self.cached = False
+        self.seconds = 0.
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Measure the code run in this context as stage `name`"""
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        elif self.trace_memory and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.) + time.perf_counter() - start
+            self.peak_rss[name] = peak_rss()
+            if self.trace_memory:
+                self.peak_traced[name] = max(self.peak_traced.get(name, 0), tracemalloc.get_traced_memory()[1])
+            if tracing:
+                tracemalloc.stop()
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self._start
+
+    def as_dict(self):
+        return {
+            "filename": self.filename,
+            "seconds": self.seconds,
+            "stages": dict(self.stages),
+            "peak_rss": dict(self.peak_rss),
+            "peak_traced": dict(self.peak_traced) if self.peak_traced is not None else None,
+            "rows": self.rows,
+            "artists": self.artists,
+            "markers": self.markers,
+            "cached": self.cached,
+        }
+
+    def to_json(self):
+        """The metrics as one line of JSON"""
+        return json.dumps(self.as_dict())
+
+    def __repr__(self):
+        stages = ", ".join("{} {:.3f}s".format(name, seconds) for name, seconds in self.stages.items())
+        return "<RenderMetrics {} {:.3f}s: {}>".format(self.filename, self.seconds, stages)
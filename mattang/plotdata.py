@@ -0,0 +1,82 @@
+from collections import namedtuple
+from collections.abc import Mapping
+
+import numpy
+from pandas import DataFrame, factorize
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+
+# Plotting metadata for one feature column.
+# `type` : "discrete" or "continuous"
+# `range` : number of colours in the feature's colourmap
+# `codes` : colourmap entry for every row, -1 for missing values
+# `values` : normalised values of a continuous feature, None for discrete ones
+# `vmin`, `vmax` : value limits of a continuous feature
+# `categories` : sorted category labels of a discrete feature, code i is categories[i]
+FeatureData = namedtuple("FeatureData", ["type", "range", "codes", "values", "vmin", "vmax", "categories"])
+
+
+def smallest_int_dtype(n):
+    """Smallest signed integer type that can hold codes -1 to `n` - 1"""
+    for dtype in (numpy.int8, numpy.int16, numpy.int32):
+        if n <= numpy.iinfo(dtype).max:
+            return dtype
+    return numpy.int64
+
+
+def is_continuous(series):
+    """Whether a column is numeric, of any width or signedness, and not boolean"""
+    return is_numeric_dtype(series.dtype) and not is_bool_dtype(series.dtype)
+
+
+def continuous_feature(series, vmin=None, vmax=None):
+    """Quantise a numeric column into `len(series) / 2` colours between `vmin` and `vmax`"""
+    values = series.to_numpy(dtype=float, na_value=numpy.nan)
+    vmin = numpy.nanmin(values) if vmin is None else vmin
+    vmax = numpy.nanmax(values) if vmax is None else vmax
+    ncolours = int(len(values) / 2)
+
+    # Same as matplotlib.colors.Normalize, which maps everything to 0 if vmin == vmax
+    normed = (values - vmin) / (vmax - vmin) if vmax > vmin else numpy.where(numpy.isnan(values), numpy.nan, 0.)
+    codes = numpy.minimum(normed * ncolours, ncolours - 1)
+    codes = numpy.where(numpy.isnan(codes), -1, codes).astype(smallest_int_dtype(ncolours))
+    return FeatureData("continuous", ncolours, codes, normed.astype(numpy.float32), vmin, vmax, None)
+
+
+def discrete_feature(series):
+    """Encode a categorical column as integer codes into its sorted categories"""
+    codes, categories = factorize(series, sort=True)
+    codes = codes.astype(smallest_int_dtype(len(categories)))
+    return FeatureData("discrete", len(categories), codes, None, None, None, numpy.asarray(categories))
+
+
+class PlotData(Mapping):
+    """Lazily computed plotting metadata for the features of a dataframe.
+    A feature's FeatureData is built the first time it's looked up and then kept, so columns
+    that are never plotted cost nothing.
+    """
+    def __init__(self, dataframe: DataFrame):
+        self.dataframe = dataframe
+        self._features = {}
+
+    def __getitem__(self, feature):
+        try:
+            return self._features[feature]
+        except KeyError:
+            pass
+        series = self.dataframe[feature]
+        if is_continuous(series):
+            data = continuous_feature(series)
+        else:
+            data = discrete_feature(series)
+        self._features[feature] = data
+        return data
+
+    def __contains__(self, feature):
+        return feature in self.dataframe.columns
+
+    def __iter__(self):
+        return iter(self.dataframe.columns)
+
+    def __len__(self):
+        return len(self.dataframe.columns)
@@ -0,0 +1,26 @@
+"""
+Parse the Natural Earth coastlines into a basemap cache directory ahead of time, so maps only
+have to clip and simplify them. The Docker image runs this when it's built:
+
+    python3 -m mattang.precompute [DIRECTORY] [--scales 110m 50m 10m]
+
+DIRECTORY defaults to $MATTANG_BASEMAP_CACHE, which FeatureMaps read the cache from.
+"""
+import argparse
+import os
+
+from .basemap import COASTLINE_SCALES, ShapefileCache, coastline_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", default=os.environ.get("MATTANG_BASEMAP_CACHE"))
+    parser.add_argument("--scales", nargs="+", default=[scale for scale, _ in COASTLINE_SCALES])
+    args = parser.parse_args()
+    if not args.directory:
+        parser.error("give a directory, or set MATTANG_BASEMAP_CACHE")
+
+    cache = ShapefileCache(args.directory)
+    for scale in args.scales:
+        geometries, _ = cache.source(coastline_path(scale))
+        print("{} coastlines: {} geometries".format(scale, len(geometries)))
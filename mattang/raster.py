@@ -0,0 +1,74 @@
+import struct
+import zlib
+
+from io import BytesIO
+
+import numpy
+
+
+VECTOR_FORMATS = ["pdf", "svg", "svgz", "eps", "ps"]
+
+
+def _png_chunk(f, kind, data):
+    f.write(struct.pack(">I", len(data)))
+    f.write(kind)
+    f.write(data)
+    f.write(struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff))
+
+
+def write_png(filename, width, height, strips, dpi=None):
+    """Write an RGBA PNG image from an iterable of horizontal `strips`, each an (rows, width, 4)
+    uint8 array, top to bottom. Only one strip needs to be in memory at a time.
+    """
+    compressor = zlib.compressobj()
+    with open(filename, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        _png_chunk(f, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        if dpi:
+            ppm = int(round(dpi / 0.0254))
+            _png_chunk(f, b"pHYs", struct.pack(">IIB", ppm, ppm, 1))
+
+        written = 0
+        for strip in strips:
+            rows = strip.shape[0]
+            written += rows
+            # Each scanline starts with its filter type, 0 for none
+            scanlines = numpy.zeros((rows, width * 4 + 1), dtype=numpy.uint8)
+            scanlines[:, 1:] = strip.reshape(rows, width * 4)
+            data = compressor.compress(scanlines.tobytes())
+            if data:
+                _png_chunk(f, b"IDAT", data)
+        _png_chunk(f, b"IDAT", compressor.flush())
+        _png_chunk(f, b"IEND", b"")
+
+    if written != height:
+        raise ValueError("Wrote {} rows of a {} row image".format(written, height))
+
+
+def render_strips(fig, dpi, rows_per_strip):
+    """Render `fig` at `dpi` one horizontal strip of `rows_per_strip` pixel rows at a time,
+    yielding each as an (rows, width, 4) uint8 array from the top down. Matplotlib only
+    allocates a canvas the size of the strip being rendered.
+    """
+    from matplotlib.transforms import Bbox
+
+    width_in, height_in = fig.get_size_inches()
+    width, height = int(width_in * dpi), int(height_in * dpi)
+    for top in range(0, height, rows_per_strip):
+        bottom = min(top + rows_per_strip, height)
+        bbox = Bbox.from_extents(0, (height - bottom) / dpi, width / dpi, (height - top) / dpi)
+        buffer = BytesIO()
+        fig.savefig(buffer, format="rgba", dpi=dpi, bbox_inches=bbox)
+        strip = numpy.frombuffer(buffer.getbuffer(), dtype=numpy.uint8)
+        yield strip.reshape(-1, width, 4)[:bottom - top]
+
+
+def save_in_strips(fig, filename, dpi, memory_budget):
+    """Save `fig` as a PNG at `dpi`, rendering it in strips so that no more than about
+    `memory_budget` bytes of raster are held at once, however large the image is.
+    """
+    width_in, height_in = fig.get_size_inches()
+    width, height = int(width_in * dpi), int(height_in * dpi)
+    # The strip's canvas, its RGBA copy and the PNG scanlines each need about 4 bytes a pixel
+    rows_per_strip = max(1, int(memory_budget // (width * 4 * 3)))
+    write_png(filename, width, height, render_strips(fig, dpi, rows_per_strip), dpi)
@@ -0,0 +1,167 @@
+"""
+Long-running render service for Mattang
+
+Starting a container per map pays for importing cartopy, matplotlib, pandas and scipy,
+loading the Natural Earth coastlines and parsing the spreadsheet, every time. This server
+keeps all of those warm and renders maps on request over HTTP on localhost:
+
+    python3 -m mattang.server --port 8757
+
+Then render with `mattang.py --server http://localhost:8757 infile outfile ...`, or POST a JSON
+object with "infile", "outfile" and optionally "features", "colours", "isoglosses",
+"shapefile" and "options" (keyword arguments to FeatureMap.draw, like dpi) to /render.
+Paths are read and written by the server, so it has to see the same filesystem as the
+client, e.g. run it on the host or in a container with the directories mounted at the same
+paths.
+"""
+import argparse
+import json
+import os
+
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from .basemap import coastline_path, shapefile_cache
+from .cache import RenderCache
+from .featuremap import FeatureMap, MattangError
+from .sheets import read_sheet
+
+
+DEFAULT_PORT = 8757
+
+# Fields of a render request, and the types their values can have
+REQUEST_FIELDS = {
+    "infile": (str,),
+    "outfile": (str,),
+    "features": (list, type(None)),
+    "colours": (list, type(None)),
+    "isoglosses": (list, type(None)),
+    "shapefile": (str, type(None)),
+    "options": (dict, type(None)),
+}
+
+
+def check_request(request):
+    """Raise ValueError if a request isn't a dict of REQUEST_FIELDS with the right types"""
+    if not isinstance(request, dict):
+        raise ValueError("Request must be a JSON object")
+    for field, types in REQUEST_FIELDS.items():
+        value = request.get(field)
+        if not isinstance(value, types):
+            raise ValueError("Bad or missing \"{}\" in request".format(field))
+        if isinstance(value, list) and not all(isinstance(item, str) for item in value):
+            raise ValueError("\"{}\" must be a list of strings".format(field))
+
+
+class RenderService:
+    """Renders maps, keeping the most recently used `maxsize` datasets loaded, and reusing
+    maps saved in `cache` (a RenderCache) if it's given
+    """
+    def __init__(self, maxsize=8, cache=None):
+        self.maxsize = maxsize
+        self.cache = cache
+        self._datasets = OrderedDict()
+
+    def warm(self, scales=("110m", "50m", "10m")):
+        """Parse the coastlines at each of `scales` ahead of the first map"""
+        for scale in scales:
+            try:
+                shapefile_cache.source(coastline_path(scale))
+            except Exception as error:
+                print("Couldn't preload {} coastlines: {}".format(scale, error))
+
+    def featuremap(self, infile, columns=None):
+        """Return a FeatureMap with the `columns` of `infile` loaded, or all of them, reusing
+        it until the file changes
+        """
+        infile = os.path.abspath(infile)
+        mtime = os.stat(infile).st_mtime_ns
+        key = (infile, mtime, tuple(sorted(columns)) if columns is not None else None)
+        # A preloaded sheet has all of its columns, so it'll do for any request
+        for k in (key, (infile, mtime, None)):
+            if k in self._datasets:
+                self._datasets.move_to_end(k)
+                return self._datasets[k]
+
+        fm = FeatureMap()
+        fm.render_cache = self.cache
+        fm.load_data(read_sheet(infile, columns))
+        self._datasets[key] = fm
+        while len(self._datasets) > self.maxsize:
+            self._datasets.popitem(last=False)
+        return fm
+
+    def render(self, request):
+        """Render the map described by a request dict, returning a RenderResult"""
+        check_request(request)
+        features = request.get("features")
+        columns = features + (request.get("isoglosses") or []) if features else None
+        fm = self.featuremap(request["infile"], columns)
+        fm.shapefile = request.get("shapefile")
+        job = (
+            request["outfile"],
+            request.get("features"),
+            request.get("colours"),
+            request.get("isoglosses"),
+            request.get("options"),
+        )
+        return fm.draw_many([job])[0]
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        if self.path != "/render":
+            self._reply(404, {"error": "Unknown path {}".format(self.path)})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            result = self.server.service.render(request)
+        except (KeyError, ValueError, OSError, MattangError) as error:
+            self._reply(400, {"error": "{}: {}".format(type(error).__name__, error)})
+            return
+        except Exception as error: # Reply rather than drop the connection
+            self._reply(500, {"error": "{}: {}".format(type(error).__name__, error)})
+            return
+        body = result._asdict()
+        body["metrics"] = result.metrics.as_dict() if result.metrics else None
+        self._reply(200 if result.error is None else 500, body)
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, preload=(), cache=None):
+    service = RenderService(cache=RenderCache(cache) if cache else None)
+    service.warm()
+    for infile in preload:
+        service.featuremap(infile)
+
+    # Renders run one at a time, since matplotlib isn't thread safe
+    server = HTTPServer((host, port), RenderHandler)
+    server.service = service
+    print("Mattang render server listening on http://{}:{}".format(host, server.server_port), flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    import matplotlib
+    matplotlib.use("Agg")
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--preload", nargs="*", default=[], help="spreadsheets to load at startup")
+    parser.add_argument("--cache", help="folder to keep rendered maps in, to skip rendering them again")
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.preload, args.cache)
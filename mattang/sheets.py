@@ -0,0 +1,121 @@
+"""
+Reading spreadsheets of languages into compact dataframes
+
+Only the columns a map needs are read, coordinates are stored as float32 and text columns
+as categoricals, so memory scales with the features plotted rather than the whole sheet.
+The format is recognised from the start of the file, as the container gets it without an
+extension: Parquet, Arrow, Excel, or delimited text with the separator sniffed.
+"""
+import csv
+
+import numpy
+import pandas
+from pandas.api.types import is_bool_dtype, is_numeric_dtype, union_categoricals
+
+from .featuremap import MattangError
+
+
+COORDINATES = ["latitude", "longitude"]
+# Rows of delimited text to parse at a time
+CHUNK_ROWS = 50000
+
+
+def sniff_format(path):
+    """Guess the format of a spreadsheet from its first bytes"""
+    with open(path, "rb") as f:
+        magic = f.read(8)
+    if magic.startswith(b"PAR1"):
+        return "parquet"
+    if magic.startswith(b"ARROW1"):
+        return "arrow"
+    if magic.startswith(b"PK\x03\x04"):
+        return "xlsx"
+    if magic.startswith(b"\xd0\xcf\x11\xe0"):
+        return "xls"
+    return "text"
+
+
+def sniff_separator(path, default="\t"):
+    """Guess the field separator of a delimited text file from its first lines"""
+    with open(path, newline="", errors="replace") as f:
+        sample = f.read(65536)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters="\t,;|").delimiter
+    except csv.Error:
+        return default
+
+
+def compact(dataframe):
+    """Store coordinates as float32 and text and mixed columns as categoricals, in place"""
+    for column in dataframe.columns:
+        series = dataframe[column]
+        if column in COORDINATES:
+            dataframe[column] = series.astype(numpy.float32)
+        elif not (is_numeric_dtype(series) or is_bool_dtype(series)):
+            dataframe[column] = series.astype("category")
+    return dataframe
+
+
+def _concat_chunks(chunks):
+    """Concatenate compacted chunks, merging the categories of categorical columns"""
+    if len(chunks) == 1:
+        return chunks[0]
+    columns = {}
+    for column in chunks[0].columns:
+        parts = [chunk[column] for chunk in chunks]
+        if any(isinstance(part.dtype, pandas.CategoricalDtype) for part in parts):
+            # The parser guesses types chunk by chunk, so a column of mostly numbers can be
+            # numeric in some chunks and text in others. Read as a whole, it's all text.
+            parts = [
+                part if isinstance(part.dtype, pandas.CategoricalDtype)
+                else part.map(str, na_action="ignore").astype("category")
+                for part in parts
+            ]
+            columns[column] = pandas.Series(union_categoricals(parts, sort_categories=True))
+        else:
+            columns[column] = pandas.concat(parts, ignore_index=True)
+    return pandas.DataFrame(columns)
+
+
+def _header(path, kind, sep):
+    if kind == "text":
+        return list(pandas.read_csv(path, sep=sep, nrows=0).columns)
+    if kind == "parquet":
+        import pyarrow.parquet
+        return pyarrow.parquet.read_schema(path, memory_map=True).names
+    if kind == "arrow":
+        import pyarrow
+        return pyarrow.ipc.open_file(pyarrow.memory_map(path)).schema.names
+    return list(pandas.read_excel(path, nrows=0).columns)
+
+
+def read_sheet(path, columns=None, chunksize=CHUNK_ROWS):
+    """Read the languages in spreadsheet `path` into a compact dataframe.
+    `columns` : feature columns to read, besides the coordinates. All of them if not given.
+    Columns that aren't in the sheet are left out, for the map to report.
+    Delimited text is parsed `chunksize` rows at a time, compacting each chunk as it goes.
+    """
+    kind = sniff_format(path)
+    sep = sniff_separator(path) if kind == "text" else None
+    try:
+        header = _header(path, kind, sep)
+        if columns is not None:
+            wanted = set(columns) | set(COORDINATES)
+            columns = [c for c in header if c in wanted]
+
+        if kind == "text":
+            reader = pandas.read_csv(path, sep=sep, usecols=columns, chunksize=chunksize)
+            chunks = [compact(chunk) for chunk in reader]
+            dataframe = _concat_chunks(chunks) if chunks else pandas.DataFrame(columns=columns or header)
+        elif kind == "parquet":
+            dataframe = pandas.read_parquet(path, columns=columns, memory_map=True)
+        elif kind == "arrow":
+            import pyarrow
+            table = pyarrow.ipc.open_file(pyarrow.memory_map(path)).read_all()
+            dataframe = (table.select(columns) if columns is not None else table).to_pandas()
+        else:
+            dataframe = pandas.read_excel(path, usecols=columns)
+    except ImportError as error:
+        raise MattangError("Can't read {} files without {}".format(kind, error.name or error))
+
+    return compact(dataframe)
@@ -0,0 +1,80 @@
+"""
+Slippy map (XYZ) tile arithmetic, in the spherical Web Mercator projection used by
+OpenStreetMap, Leaflet, etc. Tile (0, 0) of each zoom level is at the north west corner.
+"""
+import numpy
+
+
+# Half the width of the Web Mercator world, in metres
+ORIGIN_SHIFT = numpy.pi * 6378137
+MAX_LATITUDE = 85.0511287798
+
+
+def tile_bounds(z, x, y):
+    """Web Mercator (x0, x1, y0, y1) extent of tile `x`, `y` at zoom `z`"""
+    size = 2 * ORIGIN_SHIFT / 2**z
+    x0 = -ORIGIN_SHIFT + x * size
+    y1 = ORIGIN_SHIFT - y * size
+    return (x0, x0 + size, y1 - size, y1)
+
+
+def lonlat_to_tile(lons, lats, z):
+    """Fractional tile coordinates of longitudes and latitudes at zoom `z`"""
+    lats = numpy.radians(numpy.clip(lats, -MAX_LATITUDE, MAX_LATITUDE))
+    n = 2**z
+    x = (numpy.asarray(lons) + 180) / 360 * n
+    y = (1 - numpy.log(numpy.tan(lats) + 1 / numpy.cos(lats)) / numpy.pi) / 2 * n
+    return x, y
+
+
+def _touched_tiles(x, y, z, margin):
+    """Tiles under the corners of a square of half width `margin` around each fractional tile
+    coordinate. While `margin` is under a tile, these are all the tiles the square touches.
+    """
+    n = 2**z
+    tx, ty = [], []
+    for dx in (-margin, margin):
+        for dy in (-margin, margin):
+            tx.append(numpy.clip(numpy.floor(x + dx), 0, n - 1).astype(numpy.int64))
+            ty.append(numpy.clip(numpy.floor(y + dy), 0, n - 1).astype(numpy.int64))
+    return numpy.concatenate(tx), numpy.concatenate(ty)
+
+
+def point_tiles(lons, lats, z, margin):
+    """Find the tiles at zoom `z` within `margin` (a fraction of a tile) of each point.
+    Returns a dict mapping (x, y) tiles to arrays of the indices of the points touching them.
+    NaN points are left out.
+    """
+    x, y = lonlat_to_tile(lons, lats, z)
+    valid = numpy.flatnonzero(~(numpy.isnan(x) | numpy.isnan(y)))
+    tx, ty = _touched_tiles(x[valid], y[valid], z, margin)
+    index = numpy.tile(valid, 4)
+
+    # Group the point indices by tile
+    keys = tx * 2**z + ty
+    order = numpy.argsort(keys, kind="stable")
+    keys, index = keys[order], index[order]
+    tiles, starts = numpy.unique(keys, return_index=True)
+    return {
+        (int(key) // 2**z, int(key) % 2**z): numpy.unique(indices)
+        for key, indices in zip(tiles, numpy.split(index, starts[1:]))
+    }
+
+
+def line_tiles(outline, z, margin):
+    """Set of the (x, y) tiles at zoom `z` that the closed `outline`, an (n, 2) array of
+    longitudes and latitudes, passes within `margin` (a fraction of a tile) of.
+    """
+    x, y = lonlat_to_tile(outline[:, 0], outline[:, 1], z)
+    # Add points along each edge so that no step crosses more than a quarter of a tile
+    steps = numpy.ceil(numpy.hypot(numpy.diff(x), numpy.diff(y)) * 4).astype(int) + 1
+    t = numpy.concatenate([numpy.arange(s) / s for s in steps] + [[0.]])
+    start = numpy.concatenate([numpy.repeat(numpy.arange(len(steps)), steps), [len(x) - 1]])
+    end = numpy.minimum(start + 1, len(x) - 1)
+    tx, ty = _touched_tiles(
+        x[start] + (x[end] - x[start]) * t,
+        y[start] + (y[end] - y[start]) * t,
+        z, margin,
+    )
+    return set(zip(tx.tolist(), ty.tolist()))
+
@@ -11,7 +11,8 @@ AUTHOR = "Isaac Stead"
 VERSION = "0.1"
 REQUIRES_PYTHON = '>=3.6.0'
 
-REQUIRED = ["matplotlib", "numpy", "scipy", "Cartopy", "pandas",]
+REQUIRED = ["matplotlib", "numpy", "scipy", "Cartopy", "pandas", "shapely",]
+EXTRAS = {"parquet": ["pyarrow"], "excel": ["openpyxl"], "flatgeobuf": ["fiona"]}
 
 setup(
     name=NAME,
@@ -20,7 +21,8 @@ setup(
     url=URL,
     author_email=EMAIL,
     install_requires=REQUIRED,
+    extras_require=EXTRAS,
     python_requires=REQUIRES_PYTHON,
     py_modules=["mattang"],
-    packages=find_packages()
+    packages=find_packages(exclude=["benchmarks", "tests"])
 )
@@ -0,0 +1,84 @@
+"""
+Check that repeated draws from one FeatureMap don't leak figures or memory. The basemap is a
+small shapefile written for the test, so nothing is downloaded.
+
+    python -m pytest tests
+"""
+import os
+import resource
+
+import numpy
+import pandas
+import pytest
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from mattang import FeatureMap
+
+
+FEATURES = ["word_order", "vowels"]
+COLOURS = ["viridis", "plasma"]
+
+
+def rss():
+    """Current resident set size in bytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak rather than current, but it can only grow if memory does
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@pytest.fixture
+def coastline(tmp_path):
+    shapefile = pytest.importorskip("shapefile")
+    path = str(tmp_path / "coast")
+    with shapefile.Writer(path, shapeType=shapefile.POLYLINE) as writer:
+        writer.field("id", "N")
+        for i, lon in enumerate(range(130, 160, 5)):
+            writer.line([[[lon, -10], [lon + 3, -5], [lon + 1, 0]]])
+            writer.record(i)
+    return path + ".shp"
+
+
+@pytest.fixture
+def featuremap(coastline):
+    rng = numpy.random.default_rng(0)
+    n = 200
+    fm = FeatureMap()
+    fm.shapefile = coastline
+    fm.extent = [128, 165, -12, 2]
+    fm.load_data(pandas.DataFrame({
+        "name": ["language{}".format(i) for i in range(n)],
+        "latitude": rng.uniform(-12, 2, n),
+        "longitude": rng.uniform(128, 165, n),
+        "word_order": rng.choice(["SOV", "SVO", "VSO"], n),
+        "vowels": rng.integers(3, 15, n),
+        "tone": rng.choice(["yes", "no"], n),
+    }))
+    yield fm
+    fm.close()
+
+
+@pytest.mark.parametrize("reuse_figure", [False, True])
+def test_draws_leave_no_figures(featuremap, tmp_path, reuse_figure):
+    featuremap.reuse_figure = reuse_figure
+    for i in range(3):
+        featuremap.draw(str(tmp_path / "map.png"), FEATURES, COLOURS, ["tone"], dpi=50)
+        assert plt.get_fignums() == ([featuremap.fig.number] if reuse_figure else [])
+    featuremap.close()
+    assert plt.get_fignums() == []
+
+
+def test_memory_stays_flat(featuremap, tmp_path):
+    filename = str(tmp_path / "map.png")
+    for i in range(10):
+        featuremap.draw(filename, FEATURES, COLOURS, ["tone"], dpi=50)
+    baseline = rss()
+    for i in range(40):
+        featuremap.draw(filename, FEATURES, COLOURS, ["tone"], dpi=50)
+        assert plt.get_fignums() == []
+    assert rss() - baseline < max(.05 * baseline, 16 * 2**20)